@@ -0,0 +1,83 @@
+import os
+import threading
+import httpx
+
+# Connection pool shared by every Deepgram request in the process
+HTTP_MAX_CONNECTIONS = 20
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 10
+HTTP_KEEPALIVE_EXPIRY = 30.0
+HTTP_TIMEOUT = 60.0
+HTTP_CONNECT_TIMEOUT = 10.0
+
+_lock = threading.Lock()
+_http_client = None
+_gemini_configured = False
+_gemini_models = {}
+
+def get_secret(name: str) -> str:
+    """
+    Returns an API key from the environment, falling back to Streamlit secrets.
+
+    Reading the environment first lets worker processes and scripts run the
+    pipeline without Streamlit.
+
+    Raises:
+        KeyError: If the secret is not configured anywhere.
+    """
+    value = os.environ.get(name)
+    if value:
+        return value
+    try:
+        import streamlit as st
+        return st.secrets[name]
+    except (ImportError, FileNotFoundError, KeyError) as e:
+        raise KeyError(f"{name} is not set in the environment or in Streamlit secrets") from e
+
+def get_http_client() -> httpx.Client:
+    """
+    Returns the process-wide pooled httpx client.
+
+    The client keeps TCP/TLS connections alive between requests and is safe to
+    share across Streamlit script threads.
+    """
+    global _http_client
+    if _http_client is None:
+        with _lock:
+            if _http_client is None:
+                _http_client = httpx.Client(
+                    timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+                    limits=httpx.Limits(
+                        max_connections=HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+                    )
+                )
+    return _http_client
+
+def get_gemini_model(model_name: str):
+    """Returns a shared Gemini model handle, configuring the API key on first use."""
+    global _gemini_configured
+    model = _gemini_models.get(model_name)
+    if model is None:
+        # Imported here so the transcriber can use this module without loading the Gemini SDK
+        import google.generativeai as genai
+
+        with _lock:
+            if not _gemini_configured:
+                genai.configure(api_key=get_secret("GEMINI_API_KEY"))
+                _gemini_configured = True
+            model = _gemini_models.get(model_name)
+            if model is None:
+                model = genai.GenerativeModel(model_name)
+                _gemini_models[model_name] = model
+    return model
+
+def close_clients():
+    """Closes pooled connections and drops cached model handles."""
+    global _http_client, _gemini_configured
+    with _lock:
+        if _http_client is not None:
+            _http_client.close()
+        _http_client = None
+        _gemini_configured = False
+        _gemini_models.clear()
@@ -0,0 +1,315 @@
+"""
+Headless batch mode: generates and saves notes for a playlist or a list of videos.
+
+Each video passes through four stages (download, transcribe, summarize,
+save). Every stage has its own pool of worker threads and the stages are
+connected by bounded queues, so all four run at once on different videos and
+downloaded audio cannot pile up on disk ahead of transcription.
+
+Re-running the same command resumes an interrupted batch: videos that already
+have saved notes at the chosen summary level are skipped, and videos whose
+transcript is already cached go straight to summarization.
+
+The input is either a playlist URL, a single video URL, or a text file with
+one video URL per line (optionally followed by a title). Blank lines and
+lines starting with # are ignored.
+
+With --stream-audio the transcribe stage pipes each download straight into
+the Deepgram upload, and the download stage passes videos through untouched.
+
+Usage:
+    python batch.py "https://www.youtube.com/playlist?list=PL..." --level deep
+    python batch.py lectures.txt --stream-audio --stream-chunk-size 131072 --stream-buffer-chunks 8
+    python batch.py lectures.txt --download-workers 2 --transcribe-workers 4 --summarize-workers 2
+"""
+import argparse
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+
+import database
+from summarizer import summarize_text
+from transcriber import (
+    SEGMENTED_MODES, download_audio, get_cached_transcript, list_playlist_videos, transcribe_audio_file,
+    transcribe_youtube_video
+)
+from youtube_utils import extract_video_id
+
+STAGES = ('download', 'transcribe', 'summarize', 'save')
+DEFAULT_STAGE_WORKERS = {
+    'download': 2,
+    'transcribe': 4,
+    'summarize': 2,
+    'save': 1
+}
+# Videos allowed to wait in front of each stage, per worker of that stage
+QUEUE_DEPTH_PER_WORKER = 2
+
+logger = logging.getLogger("flashlearn.batch")
+
+_STOP = object()
+
+class BatchItem:
+    """One video moving through the batch pipeline."""
+
+    def __init__(self, youtube_url: str, title: str):
+        self.youtube_url = youtube_url
+        self.title = title
+        self.audio_dir = None
+        self.audio_path = None
+        self.transcript = None
+        self.summary = None
+        self.error = None
+        self.interrupted = False
+
+def read_video_list(source: str) -> list:
+    """
+    Resolves the batch input into (video_url, title) pairs.
+
+    Args:
+        source (str): A path to a file of URLs, a playlist URL or a video URL.
+
+    Returns:
+        list: (video_url, title) pairs; title is None when not known.
+    """
+    if os.path.isfile(source):
+        videos = []
+        with open(source, encoding='utf-8') as url_file:
+            for line in url_file:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                url, _, title = line.partition(' ')
+                videos.append((url, title.strip() or None))
+        return videos
+    if extract_video_id(source) and '/playlist' not in source:
+        return [(source, None)]
+    return list_playlist_videos(source)
+
+class BatchPipeline:
+    """
+    Runs videos through the download, transcribe, summarize and save stages.
+
+    Each stage is a set of threads reading from its own bounded queue. Failed
+    and interrupted videos still flow through to the end (skipping the work)
+    so they are counted and their temporary audio is cleaned up.
+    """
+
+    def __init__(self, summary_level: str, stage_workers: dict, segmented: bool = None,
+                 stream_audio: bool = False, stream_chunk_size: int = None, stream_buffer_chunks: int = None):
+        self.summary_level = summary_level
+        self.stage_workers = stage_workers
+        self.segmented = segmented
+        self.stream_audio = stream_audio
+        self.stream_chunk_size = stream_chunk_size
+        self.stream_buffer_chunks = stream_buffer_chunks
+        self.queues = {
+            stage: queue.Queue(maxsize=stage_workers[stage] * QUEUE_DEPTH_PER_WORKER) for stage in STAGES
+        }
+        self.stop_event = threading.Event()
+        self.finished = []
+        self.stage_seconds = {stage: 0.0 for stage in STAGES}
+        self.stage_counts = {stage: 0 for stage in STAGES}
+        self._running_workers = dict(stage_workers)
+        self._lock = threading.Lock()
+        self._work_dir = None
+
+    def _download(self, item: BatchItem) -> bool:
+        if item.transcript is not None or self.stream_audio:
+            return False
+        item.audio_dir = tempfile.mkdtemp(dir=self._work_dir)
+        item.audio_path = download_audio(item.youtube_url, item.audio_dir)
+        return True
+
+    def _transcribe(self, item: BatchItem) -> bool:
+        if item.transcript is not None:
+            return False
+        if self.stream_audio:
+            item.transcript = transcribe_youtube_video(
+                item.youtube_url, stream_audio=True, segmented=self.segmented,
+                stream_chunk_size=self.stream_chunk_size, stream_buffer_chunks=self.stream_buffer_chunks
+            )
+            return True
+        try:
+            item.transcript = transcribe_audio_file(item.audio_path, item.youtube_url, segmented=self.segmented)
+        finally:
+            self._remove_audio(item)
+        return True
+
+    def _summarize(self, item: BatchItem) -> bool:
+        item.summary = summarize_text(item.transcript, self.summary_level)
+        return True
+
+    def _save(self, item: BatchItem) -> bool:
+        database.save_notes_to_db(item.title, item.youtube_url, self.summary_level, item.summary)
+        return True
+
+    def _remove_audio(self, item: BatchItem):
+        if item.audio_dir:
+            shutil.rmtree(item.audio_dir, ignore_errors=True)
+            item.audio_dir = item.audio_path = None
+
+    def _stage_worker(self, stage: str, handler, next_stage: str):
+        inbox = self.queues[stage]
+        while True:
+            item = inbox.get()
+            if item is _STOP:
+                break
+            if self.stop_event.is_set() and item.error is None:
+                item.interrupted = True
+            if item.error is None and not item.interrupted:
+                start = time.perf_counter()
+                try:
+                    did_work = handler(item)
+                except Exception as e:
+                    item.error = f"{stage} failed: {e}"
+                    logger.warning("%s: %s", item.youtube_url, item.error)
+                else:
+                    if did_work:
+                        with self._lock:
+                            self.stage_seconds[stage] += time.perf_counter() - start
+                            self.stage_counts[stage] += 1
+            if next_stage:
+                self.queues[next_stage].put(item)
+            else:
+                self._finish(item)
+
+        # The last worker out tells every worker of the next stage to stop
+        with self._lock:
+            self._running_workers[stage] -= 1
+            last_worker = self._running_workers[stage] == 0
+        if last_worker and next_stage:
+            for _ in range(self.stage_workers[next_stage]):
+                self.queues[next_stage].put(_STOP)
+
+    def _finish(self, item: BatchItem):
+        self._remove_audio(item)
+        if item.error is None and not item.interrupted:
+            logger.info("Saved notes for %s", item.youtube_url)
+        with self._lock:
+            self.finished.append(item)
+
+    def run(self, items: list):
+        """Runs the items through every stage and blocks until all are finished or interrupted."""
+        handlers = {
+            'download': self._download,
+            'transcribe': self._transcribe,
+            'summarize': self._summarize,
+            'save': self._save
+        }
+        self._work_dir = tempfile.mkdtemp(prefix="flashlearn-batch-")
+        threads = []
+        for index, stage in enumerate(STAGES):
+            next_stage = STAGES[index + 1] if index + 1 < len(STAGES) else None
+            for worker in range(self.stage_workers[stage]):
+                thread = threading.Thread(
+                    target=self._stage_worker, args=(stage, handlers[stage], next_stage),
+                    name=f"batch-{stage}-{worker}", daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        def feed():
+            for item in items:
+                self.queues['download'].put(item)
+            for _ in range(self.stage_workers['download']):
+                self.queues['download'].put(_STOP)
+
+        feeder = threading.Thread(target=feed, name="batch-feeder", daemon=True)
+        feeder.start()
+        try:
+            for thread in [feeder] + threads:
+                # Joining with a timeout keeps the main thread responsive to Ctrl+C
+                while thread.is_alive():
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            logger.info("Interrupted; letting running stages finish and skipping the rest...")
+            self.stop_event.set()
+            for thread in [feeder] + threads:
+                thread.join()
+        finally:
+            shutil.rmtree(self._work_dir, ignore_errors=True)
+
+def plan_batch(videos: list, summary_level: str):
+    """
+    Turns (video_url, title) pairs into BatchItems, dropping duplicates and
+    videos that already have saved notes at `summary_level`.
+
+    Returns:
+        tuple: (items, skipped_count).
+    """
+    items = []
+    seen = set()
+    skipped = 0
+    for youtube_url, title in videos:
+        video_key = extract_video_id(youtube_url) or youtube_url
+        if video_key in seen:
+            continue
+        seen.add(video_key)
+        if database.find_notes_for_video(youtube_url, summary_level):
+            skipped += 1
+            continue
+        item = BatchItem(youtube_url, title or "Untitled Notes")
+        item.transcript = get_cached_transcript(youtube_url)
+        items.append(item)
+    return items, skipped
+
+def print_summary(pipeline: BatchPipeline, skipped: int, wall_seconds: float):
+    saved = [item for item in pipeline.finished if item.error is None and not item.interrupted]
+    failed = [item for item in pipeline.finished if item.error is not None]
+    interrupted = [item for item in pipeline.finished if item.interrupted]
+
+    print(f"Batch finished in {wall_seconds:.1f}s: {len(saved)} saved, {skipped} already saved, "
+          f"{len(failed)} failed, {len(interrupted)} interrupted")
+    if wall_seconds > 0:
+        print(f"  throughput {len(saved) / wall_seconds * 3600:.1f} videos/hour")
+    for stage in STAGES:
+        count = pipeline.stage_counts[stage]
+        busy = pipeline.stage_seconds[stage]
+        mean = busy / count if count else 0.0
+        print(f"  {stage:<10} {pipeline.stage_workers[stage]} worker(s)  {count:4d} video(s)  "
+              f"busy {busy:8.1f}s  mean {mean:6.1f}s")
+    for item in failed:
+        print(f"  FAILED {item.youtube_url}: {item.error}")
+    if interrupted:
+        print("  Run the same command again to resume.")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', help="Playlist URL, video URL, or a file with one video URL per line")
+    parser.add_argument('--level', choices=['brief', 'moderate', 'deep'], default='moderate',
+                        help="Summary level for every video")
+    for stage in STAGES:
+        parser.add_argument(f'--{stage}-workers', type=int, default=DEFAULT_STAGE_WORKERS[stage],
+                            help=f"Concurrent {stage} workers")
+    parser.add_argument('--segmented', choices=['auto', 'always', 'never'], default='auto',
+                        help="Transcribe videos as parallel segments: always, never, or (auto) only long ones")
+    parser.add_argument('--stream-audio', action='store_true',
+                        help="Pipe downloads straight into the Deepgram upload instead of staging them on disk")
+    parser.add_argument('--stream-chunk-size', type=int, default=None,
+                        help="Bytes per streamed audio chunk (default: transcriber.STREAM_CHUNK_SIZE)")
+    parser.add_argument('--stream-buffer-chunks', type=int, default=None,
+                        help="Chunks buffered ahead of the upload (default: transcriber.STREAM_BUFFER_CHUNKS)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    stage_workers = {stage: max(getattr(args, f'{stage}_workers'), 1) for stage in STAGES}
+
+    videos = read_video_list(args.source)
+    items, skipped = plan_batch(videos, args.level)
+    logger.info("%d video(s) to process, %d already saved", len(items), skipped)
+
+    pipeline = BatchPipeline(
+        args.level, stage_workers, segmented=SEGMENTED_MODES[args.segmented], stream_audio=args.stream_audio,
+        stream_chunk_size=args.stream_chunk_size, stream_buffer_chunks=args.stream_buffer_chunks
+    )
+    start = time.perf_counter()
+    pipeline.run(items)
+    print_summary(pipeline, skipped, time.perf_counter() - start)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+"""
+Local stand-ins for YouTube, Deepgram and Gemini used by the offline benchmarks.
+
+FakeDeepgramServer is a real HTTP server on localhost, so the transcriber's httpx
+client, pooling and upload code run unchanged. The yt-dlp and Gemini stand-ins
+replace only the network-bound calls.
+"""
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+VOCABULARY = (
+    "the entropy of a closed system never decreases and this lecture explains why "
+    "energy temperature heat work equilibrium state particle probability distribution "
+    "quantum field theory describes interactions through exchange of virtual particles"
+).split()
+
+def synthetic_words(duration_seconds: float, words_per_second: float, offset_seed: int = 0) -> list:
+    """
+    Builds a Deepgram-style word list spanning `duration_seconds` of speech.
+
+    Different `offset_seed` values give different transcripts, so benchmark jobs
+    do not hit each other's summary cache entries.
+    """
+    words = []
+    count = int(duration_seconds * words_per_second)
+    step = 1.0 / words_per_second
+    for index in range(count):
+        word = VOCABULARY[(index + offset_seed) % len(VOCABULARY)]
+        punctuated = word.capitalize() if index % 12 == 0 else word
+        if index % 12 == 11:
+            punctuated += '.'
+        words.append({
+            'word': word,
+            'punctuated_word': punctuated,
+            'start': round(index * step, 3),
+            'end': round(index * step + step * 0.8, 3),
+            'speaker': (index // 120) % 2
+        })
+    return words
+
+class FakeDeepgramServer:
+    """
+    A threaded HTTP server that imitates the Deepgram /v1/listen endpoint.
+
+    The "audio" duration is inferred from the upload size and `audio_kbps`.
+    Each request sleeps for `latency + latency_per_mb * MB` and fails with a
+    503 with probability `error_rate`.
+    """
+
+    def __init__(self, audio_kbps: int = 128, words_per_second: float = 2.5,
+                 latency: float = 0.2, latency_per_mb: float = 0.01, error_rate: float = 0.0):
+        self.audio_kbps = audio_kbps
+        self.words_per_second = words_per_second
+        self.latency = latency
+        self.latency_per_mb = latency_per_mb
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1/listen"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _read_body(self) -> int:
+                if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+                    total = 0
+                    while True:
+                        size = int(self.rfile.readline().split(b';')[0].strip(), 16)
+                        if size == 0:
+                            self.rfile.readline()
+                            return total
+                        remaining = size
+                        while remaining:
+                            remaining -= len(self.rfile.read(min(remaining, 1 << 20)))
+                        self.rfile.readline()
+                        total += size
+                remaining = int(self.headers.get('Content-Length', 0))
+                total = remaining
+                while remaining:
+                    remaining -= len(self.rfile.read(min(remaining, 1 << 20)))
+                return total
+
+            def do_POST(self):
+                body_bytes = self._read_body()
+                with fake._lock:
+                    fake.requests += 1
+                    request_number = fake.requests
+                    fake.bytes_received += body_bytes
+                    failed = random.random() < fake.error_rate
+                    if failed:
+                        fake.errors += 1
+
+                time.sleep(fake.latency + fake.latency_per_mb * body_bytes / (1 << 20))
+
+                if failed:
+                    payload = json.dumps({'err_msg': 'fake upstream failure'}).encode('utf-8')
+                    self.send_response(503)
+                    self.send_header('Retry-After', '1')
+                else:
+                    duration = body_bytes / (fake.audio_kbps * 1000 / 8)
+                    words = synthetic_words(duration, fake.words_per_second, offset_seed=request_number)
+                    transcript = ' '.join(word['punctuated_word'] for word in words)
+                    payload = json.dumps({
+                        'results': {'channels': [{'alternatives': [{'transcript': transcript, 'words': words}]}]}
+                    }).encode('utf-8')
+                    self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+class FakeYouTube:
+    """
+    Produces synthetic audio in place of yt-dlp downloads.
+
+    Audio size is `audio_seconds * audio_kbps / 8` kB, delivered at
+    `download_mbps` to simulate the network transfer.
+    """
+
+    def __init__(self, audio_seconds: float = 600, audio_kbps: int = 128, download_mbps: float = 200.0,
+                 chunk_size: int = 256 * 1024):
+        self.audio_seconds = audio_seconds
+        self.audio_kbps = audio_kbps
+        self.download_mbps = download_mbps
+        self.chunk_size = chunk_size
+
+    @property
+    def audio_bytes(self) -> int:
+        return int(self.audio_seconds * self.audio_kbps * 1000 / 8)
+
+    def iter_chunks(self):
+        """Yields the synthetic audio in chunks, pacing them at the download rate."""
+        remaining = self.audio_bytes
+        chunk = os.urandom(self.chunk_size)
+        seconds_per_chunk = self.chunk_size * 8 / (self.download_mbps * 1_000_000)
+        while remaining > 0:
+            size = min(remaining, self.chunk_size)
+            time.sleep(seconds_per_chunk)
+            yield chunk[:size]
+            remaining -= size
+
+    def download(self, youtube_url: str, temp_dir: str) -> str:
+        """Stand-in for transcriber._download_audio: writes the audio file and returns its path."""
+        path = os.path.join(temp_dir, 'audio.mp4')
+        with open(path, 'wb') as audio_file:
+            for chunk in self.iter_chunks():
+                audio_file.write(chunk)
+        return path
+
+    def stream(self, youtube_url: str, chunk_size: int = None, max_buffered_chunks: int = None):
+        """Stand-in for transcriber._stream_audio_chunks."""
+        return self.iter_chunks()
+
+    def probe_duration(self, audio_path: str) -> float:
+        """Stand-in for transcriber._probe_duration."""
+        return os.path.getsize(audio_path) / (self.audio_kbps * 1000 / 8)
+
+    def cut_segment(self, audio_path: str, output_path: str, start: float, length: float):
+        """Stand-in for transcriber._cut_segment: copies the byte range for the time range."""
+        bytes_per_second = self.audio_kbps * 1000 / 8
+        with open(audio_path, 'rb') as source, open(output_path, 'wb') as target:
+            source.seek(int(start * bytes_per_second))
+            target.write(source.read(int(length * bytes_per_second)))
+
+class FakeGeminiError(Exception):
+    """Mimics google.api_core errors, which carry the HTTP status as `code`."""
+
+    def __init__(self, message: str, code: int):
+        super().__init__(message)
+        self.code = code
+
+class FakeGeminiResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+class FakeGeminiModel:
+    """
+    Stand-in for google.generativeai.GenerativeModel.
+
+    Latency grows with prompt size (`latency + latency_per_1k_tokens`), and a call
+    raises with probability `error_rate`.
+    """
+
+    def __init__(self, latency: float = 0.5, latency_per_1k_tokens: float = 0.02, error_rate: float = 0.0):
+        self.latency = latency
+        self.latency_per_1k_tokens = latency_per_1k_tokens
+        self.error_rate = error_rate
+        self.calls = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt: str, stream: bool = False, **kwargs):
+        with self._lock:
+            self.calls += 1
+            failed = random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        tokens = len(prompt) / 4
+        total_latency = self.latency + self.latency_per_1k_tokens * tokens / 1000
+        words = prompt.split()
+        summary = f"# Summary\n\n- {' '.join(words[-min(len(words), 300):])}"
+
+        if not stream:
+            time.sleep(total_latency)
+            if failed:
+                raise FakeGeminiError("fake Gemini failure", code=503)
+            return FakeGeminiResponse(summary)
+        return self._stream(summary, total_latency, failed)
+
+    def _stream(self, summary: str, total_latency: float, failed: bool):
+        # The first chunk arrives after a fifth of the total latency, the rest are spread evenly
+        time.sleep(total_latency * 0.2)
+        if failed:
+            raise FakeGeminiError("fake Gemini failure", code=503)
+        pieces = [summary[index:index + 200] for index in range(0, len(summary), 200)]
+        for piece in pieces:
+            yield FakeGeminiResponse(piece)
+            time.sleep(total_latency * 0.8 / len(pieces))
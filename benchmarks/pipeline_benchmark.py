@@ -0,0 +1,193 @@
+"""
+Offline end-to-end benchmark of transcribe_youtube_video -> summarize_text -> save_notes_to_db.
+
+Runs against a local fake Deepgram HTTP server, a stubbed Gemini model and a
+yt-dlp stand-in that serves synthetic audio (see benchmarks/fakes.py), so it
+needs no network access or API keys. Everything is written to a scratch
+directory; the real notes.db and caches are never touched.
+
+Reports p50/p95 latency per stage and end to end, throughput for N concurrent
+jobs, error counts, prompt tokens saved by preprocessing and peak RSS.
+
+Usage:
+    python benchmarks/pipeline_benchmark.py --jobs 20 --concurrency 4 --audio-seconds 1800 --mode stream
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import FakeDeepgramServer, FakeGeminiModel, FakeYouTube
+
+def percentile(samples: list, pct: float) -> float:
+    """Returns the `pct` percentile (0-100) of `samples` using nearest-rank."""
+    if not samples:
+        return float('nan')
+    ordered = sorted(samples)
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+def peak_rss_mb() -> float:
+    """Returns this process's peak resident set size in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _prepare_scratch_dir(scratch_dir: str):
+    """Points the app at the scratch directory and gives it placeholder API keys."""
+    os.environ.setdefault('DEEPGRAM_API_KEY', 'offline-benchmark')
+    os.environ.setdefault('GEMINI_API_KEY', 'offline-benchmark')
+    os.chdir(scratch_dir)
+
+def run_benchmark(args) -> dict:
+    deepgram = FakeDeepgramServer(
+        audio_kbps=args.audio_kbps,
+        words_per_second=args.words_per_second,
+        latency=args.deepgram_latency,
+        error_rate=args.deepgram_error_rate
+    ).start()
+    youtube = FakeYouTube(audio_seconds=args.audio_seconds, audio_kbps=args.audio_kbps, download_mbps=args.download_mbps)
+    gemini = FakeGeminiModel(latency=args.gemini_latency, error_rate=args.gemini_error_rate)
+
+    # Imported after chdir so the module-level caches land in the scratch directory
+    import api_clients
+    import database
+    import preprocess
+    import summarizer
+    import transcriber
+
+    transcriber.DEEPGRAM_URL = deepgram.url
+    transcriber._download_audio = youtube.download
+    transcriber._stream_audio_chunks = youtube.stream
+    transcriber._probe_duration = youtube.probe_duration
+    transcriber._cut_segment = youtube.cut_segment
+    api_clients._gemini_models[summarizer.MODEL_NAME] = gemini
+    database.DB_FILE = os.path.join(os.getcwd(), 'bench_notes.db')
+    if args.no_preprocess:
+        preprocess.preprocess_transcript = lambda text, level: (text, {
+            'tokens_before': summarizer.estimate_tokens(text),
+            'tokens_after': summarizer.estimate_tokens(text),
+            'reduction': 0.0
+        })
+
+    def run_job(index: int) -> dict:
+        video_id = f"bench{index:06d}"
+        youtube_url = f"https://www.youtube.com/watch?v={video_id}"
+        timings = {}
+        start = time.perf_counter()
+        try:
+            transcript = transcriber.transcribe_youtube_video(
+                youtube_url,
+                stream_audio=args.mode == 'stream',
+                segmented=args.mode == 'segmented'
+            )
+        except transcriber.TranscriptionError:
+            return {'ok': False, 'stage': 'transcribe'}
+        timings['transcribe'] = time.perf_counter() - start
+
+        def record_tokens(token_stats):
+            timings['tokens_before'] = token_stats['tokens_before']
+            timings['tokens_after'] = token_stats['tokens_after']
+
+        stage_start = time.perf_counter()
+        try:
+            summary = summarizer.summarize_text(transcript, args.summary_level, on_preprocessed=record_tokens)
+        except summarizer.SummarizationError:
+            return {'ok': False, 'stage': 'summarize', **timings}
+        timings['summarize'] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        database.save_notes_to_db(f"Benchmark {index}", youtube_url, args.summary_level, summary)
+        timings['save'] = time.perf_counter() - stage_start
+        timings['total'] = time.perf_counter() - start
+        return {'ok': True, **timings}
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        jobs = list(executor.map(run_job, range(args.jobs)))
+    wall_seconds = time.perf_counter() - wall_start
+    deepgram.stop()
+
+    completed = [job for job in jobs if job['ok']]
+    stages = {}
+    for stage in ('transcribe', 'summarize', 'save', 'total'):
+        samples = [job[stage] for job in completed if stage in job]
+        stages[stage] = {'p50': percentile(samples, 50), 'p95': percentile(samples, 95)}
+
+    return {
+        'mode': args.mode,
+        'jobs': args.jobs,
+        'concurrency': args.concurrency,
+        'audio_seconds': args.audio_seconds,
+        'audio_mb': youtube.audio_bytes / (1 << 20),
+        'completed': len(completed),
+        'failed_transcribe': sum(1 for job in jobs if not job['ok'] and job['stage'] == 'transcribe'),
+        'failed_summarize': sum(1 for job in jobs if not job['ok'] and job['stage'] == 'summarize'),
+        'wall_seconds': wall_seconds,
+        'throughput_jobs_per_min': len(completed) / wall_seconds * 60 if wall_seconds else 0.0,
+        'stages': stages,
+        'deepgram_requests': deepgram.requests,
+        'deepgram_errors': deepgram.errors,
+        'gemini_calls': gemini.calls,
+        'gemini_errors': gemini.errors,
+        'tokens_before': sum(job.get('tokens_before', 0) for job in completed),
+        'tokens_after': sum(job.get('tokens_after', 0) for job in completed),
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+def print_report(results: dict):
+    print(f"Mode {results['mode']}: {results['jobs']} jobs x {results['audio_mb']:.1f} MB audio "
+          f"({results['audio_seconds']:.0f}s), concurrency {results['concurrency']}")
+    print(f"  completed {results['completed']}  failed transcribe {results['failed_transcribe']}  "
+          f"failed summarize {results['failed_summarize']}")
+    print(f"  wall {results['wall_seconds']:.2f}s  throughput {results['throughput_jobs_per_min']:.1f} jobs/min")
+    for stage, stats in results['stages'].items():
+        print(f"  {stage:<10} p50 {stats['p50'] * 1000:9.1f} ms   p95 {stats['p95'] * 1000:9.1f} ms")
+    print(f"  deepgram requests {results['deepgram_requests']} (errors {results['deepgram_errors']})  "
+          f"gemini calls {results['gemini_calls']} (errors {results['gemini_errors']})")
+    if results['tokens_before']:
+        saved = 1 - results['tokens_after'] / results['tokens_before']
+        print(f"  prompt tokens {results['tokens_before']:,} -> {results['tokens_after']:,} ({saved:.1%} saved)")
+    print(f"  peak RSS {results['peak_rss_mb']:.1f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--mode', choices=['buffered', 'stream', 'segmented'], default='buffered')
+    parser.add_argument('--summary-level', choices=['brief', 'moderate', 'deep'], default='moderate')
+    parser.add_argument('--audio-seconds', type=float, default=600)
+    parser.add_argument('--audio-kbps', type=int, default=128)
+    parser.add_argument('--download-mbps', type=float, default=200.0, help="Simulated download bandwidth")
+    parser.add_argument('--words-per-second', type=float, default=2.5, help="Speech rate of the fake transcripts")
+    parser.add_argument('--deepgram-latency', type=float, default=0.2)
+    parser.add_argument('--deepgram-error-rate', type=float, default=0.0)
+    parser.add_argument('--gemini-latency', type=float, default=0.5)
+    parser.add_argument('--gemini-error-rate', type=float, default=0.0)
+    parser.add_argument('--no-preprocess', action='store_true', help="Summarize the raw transcript")
+    parser.add_argument('--json', help="Also write the results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        original_dir = os.getcwd()
+        _prepare_scratch_dir(scratch_dir)
+        try:
+            results = run_benchmark(args)
+        finally:
+            os.chdir(original_dir)
+
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w') as results_file:
+            json.dump(results, results_file, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Measures cold import time of the app's modules and time to first render of main.py.
+
+Each measurement runs in a fresh interpreter so nothing is cached between runs.
+The first render uses Streamlit's AppTest harness in a scratch directory, so the
+real notes.db is never touched.
+
+Usage:
+    python benchmarks/startup_benchmark.py [--runs N] [--json results.json]
+                                           [--baseline results.json] [--max-regression 0.2]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_TARGETS = ['streamlit', 'styles', 'database', 'transcriber', 'summarizer']
+
+# Modules the first render of main.py should not need
+HEAVY_MODULES = ['yt_dlp', 'httpx', 'google.generativeai', 'transcriber', 'summarizer']
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+RENDER_SNIPPET = """
+import sys, time, json
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({script!r}, default_timeout=60)
+app.session_state['page'] = {page!r}
+start = time.perf_counter()
+app.run()
+elapsed = time.perf_counter() - start
+loaded = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{'seconds': elapsed, 'exceptions': len(app.exception), 'heavy_modules': loaded}}))
+"""
+
+def _run_python(snippet: str, cwd: str):
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    result = subprocess.run([sys.executable, '-c', snippet], cwd=cwd, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        return None, result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'failed'
+    return result.stdout.strip().splitlines()[-1], None
+
+def measure_imports(runs: int, cwd: str) -> dict:
+    """Returns median/min cold import time in seconds for every module in IMPORT_TARGETS."""
+    results = {}
+    for module in IMPORT_TARGETS:
+        samples = []
+        error = None
+        for _ in range(runs):
+            output, error = _run_python(IMPORT_SNIPPET.format(module=module), cwd)
+            if output is None:
+                break
+            samples.append(float(output))
+        if samples:
+            results[module] = {'median': statistics.median(samples), 'min': min(samples)}
+        else:
+            results[module] = {'error': error}
+    return results
+
+def measure_first_render(runs: int, cwd: str) -> dict:
+    """Returns median/min time for the first AppTest run of main.py on each page."""
+    script = os.path.join(REPO_ROOT, 'main.py')
+    results = {}
+    for page in ['Summarize Video', 'View Saved Notes']:
+        samples = []
+        details = {}
+        error = None
+        for _ in range(runs):
+            snippet = RENDER_SNIPPET.format(script=script, page=page, heavy=HEAVY_MODULES)
+            output, error = _run_python(snippet, cwd)
+            if output is None:
+                break
+            details = json.loads(output)
+            samples.append(details['seconds'])
+        if samples:
+            results[page] = {
+                'median': statistics.median(samples),
+                'min': min(samples),
+                'exceptions': details['exceptions'],
+                'heavy_modules': details['heavy_modules']
+            }
+        else:
+            results[page] = {'error': error}
+    return results
+
+def compare_to_baseline(results: dict, baseline: dict, max_regression: float) -> list:
+    """Returns a description of every median that regressed by more than `max_regression`."""
+    regressions = []
+    for section in ('imports', 'first_render'):
+        for name, current in results.get(section, {}).items():
+            previous = baseline.get(section, {}).get(name, {})
+            if 'median' in current and 'median' in previous and previous['median'] > 0:
+                change = current['median'] / previous['median'] - 1
+                if change > max_regression:
+                    regressions.append(f"{section}/{name}: {previous['median']:.3f}s -> {current['median']:.3f}s (+{change:.0%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument('--json', help="Write results to this file")
+    parser.add_argument('--baseline', help="Compare against results previously written with --json")
+    parser.add_argument('--max-regression', type=float, default=0.2, help="Allowed slowdown vs. baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        results = {
+            'python': sys.version.split()[0],
+            'imports': measure_imports(args.runs, scratch_dir),
+            'first_render': measure_first_render(args.runs, scratch_dir)
+        }
+
+    print("Cold import time (fresh interpreter):")
+    for module, stats in results['imports'].items():
+        if 'median' in stats:
+            print(f"  {module:<14} median {stats['median'] * 1000:8.1f} ms   min {stats['min'] * 1000:8.1f} ms")
+        else:
+            print(f"  {module:<14} unavailable: {stats['error']}")
+
+    print("First render of main.py (AppTest):")
+    for page, stats in results['first_render'].items():
+        if 'median' in stats:
+            heavy = ', '.join(stats['heavy_modules']) or 'none'
+            print(f"  {page:<18} median {stats['median'] * 1000:8.1f} ms   min {stats['min'] * 1000:8.1f} ms   "
+                  f"exceptions {stats['exceptions']}   heavy modules loaded: {heavy}")
+        else:
+            print(f"  {page:<18} unavailable: {stats['error']}")
+
+    if args.json:
+        with open(args.json, 'w') as results_file:
+            json.dump(results, results_file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare_to_baseline(results, json.load(baseline_file), args.max_regression)
+        if regressions:
+            print("Regressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
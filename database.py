@@ -1,13 +1,108 @@
+import re
+import html
+import zlib
+import hashlib
 import sqlite3
-import pandas as pd
+import threading
+import logging
 import os
 
+from metrics import span
+from youtube_utils import extract_video_id
+
 DB_FILE = "notes.db"
 
-def init_db():
-    """Initializes the database schema if it does not exist."""
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+NOTE_COLUMNS = ('id', 'title', 'youtube_url', 'summary_level', 'notes_content', 'created_at')
+NOTE_METADATA_COLUMNS = ('id', 'title', 'youtube_url', 'summary_level', 'created_at')
+
+# Connection tuning applied to every per-thread connection
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA busy_timeout=5000"
+)
+
+# Storage formats for notes_content, recorded in the content_format column
+NOTE_FORMAT_TEXT = 0
+NOTE_FORMAT_ZLIB = 1
+COMPRESS_MIN_BYTES = 256
+COMPRESS_LEVEL = 9
+
+# Word timings of videos without saved notes are kept as long as the transcript
+# cache keeps their transcript (its TTL is set from this), so a cache hit never
+# finds the timings already gone
+TRANSCRIPT_RETENTION_SECONDS = 30 * 24 * 60 * 60
+
+logger = logging.getLogger("flashlearn.database")
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_initialized_files = set()
+# Index generation each notes database was last synced at, see SemanticIndex.generation
+_synced_index_generations = {}
+
+def encode_note_content(notes_content: str):
+    """
+    Encodes a notes body for storage.
+
+    Returns:
+        tuple: (stored_value, content_format). Bodies are zlib-compressed unless
+            they are short or compression would not make them smaller.
+    """
+    if notes_content is None:
+        return None, NOTE_FORMAT_TEXT
+    raw = notes_content.encode('utf-8')
+    if len(raw) >= COMPRESS_MIN_BYTES:
+        compressed = zlib.compress(raw, COMPRESS_LEVEL)
+        if len(compressed) < len(raw):
+            return compressed, NOTE_FORMAT_ZLIB
+    return notes_content, NOTE_FORMAT_TEXT
+
+def decode_note_content(stored_value, content_format):
+    """Returns the plain-text notes body for a stored value and its format marker."""
+    if stored_value is None:
+        return None
+    if content_format == NOTE_FORMAT_ZLIB:
+        return zlib.decompress(stored_value).decode('utf-8')
+    if isinstance(stored_value, bytes):
+        return stored_value.decode('utf-8')
+    return stored_value
+
+def get_connection() -> sqlite3.Connection:
+    """
+    Returns this thread's connection to DB_FILE, opening it on first use.
+
+    Connections are kept per thread so they are reused across calls without
+    being shared between threads. Streamlit runs each script rerun on a new
+    thread, so in the app a connection lasts for one rerun and is closed with
+    that thread's locals; batch and worker threads keep theirs until they exit.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.db_file == DB_FILE:
+        return conn
+    if conn is not None:
+        conn.close()
+
+    conn = sqlite3.connect(DB_FILE, timeout=30.0)
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+    # Used by read queries only; nothing in the schema calls it, so any SQLite client can write the file
+    conn.create_function('note_text', 2, decode_note_content, deterministic=True)
+    _local.conn = conn
+    _local.db_file = DB_FILE
+    return conn
+
+def close_connection():
+    """Closes this thread's connection, if any."""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+def _migration_create_notes(c):
     c.execute('''
         CREATE TABLE IF NOT EXISTS notes (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -18,38 +113,761 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
-    conn.commit()
-    conn.close()
 
-def save_notes_to_db(title: str, youtube_url: str, summary_level: str, notes_content: str):
-    """Saves the generated notes to the database."""
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+def _migration_video_id_and_indexes(c):
+    columns = [row[1] for row in c.execute("PRAGMA table_info(notes)")]
+    if 'video_id' not in columns:
+        c.execute("ALTER TABLE notes ADD COLUMN video_id TEXT")
+    rows = c.execute("SELECT id, youtube_url FROM notes WHERE video_id IS NULL").fetchall()
+    c.executemany(
+        "UPDATE notes SET video_id = ? WHERE id = ?",
+        [(extract_video_id(url), note_id) for note_id, url in rows]
+    )
+    c.execute("CREATE INDEX IF NOT EXISTS idx_notes_created_at ON notes (created_at DESC)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_notes_youtube_url ON notes (youtube_url)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_notes_video_level ON notes (video_id, summary_level, created_at DESC)")
+
+def _migration_keyset_index(c):
+    c.execute("DROP INDEX IF EXISTS idx_notes_created_at")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_notes_created_at_id ON notes (created_at, id)")
+
+def _migration_compressed_content(c):
+    columns = [row[1] for row in c.execute("PRAGMA table_info(notes)")]
+    if 'content_format' not in columns:
+        c.execute(f"ALTER TABLE notes ADD COLUMN content_format INTEGER NOT NULL DEFAULT {NOTE_FORMAT_TEXT}")
+    _compress_rows(c)
+
+def _migration_notes_fts(c):
+    # Contentless, so bodies are not stored a second time uncompressed. The app feeds
+    # it plain text and nothing in the schema calls note_text(), so any SQLite client
+    # can still write to notes.
+    c.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+            title, notes_content,
+            content='', tokenize='porter unicode61'
+        )
+    ''')
+    # Which notes are in notes_fts, and a hash of the text they were indexed with
     c.execute('''
-        INSERT INTO notes (title, youtube_url, summary_level, notes_content)
-        VALUES (?, ?, ?, ?)
-    ''', (title, youtube_url, summary_level, notes_content))
-    conn.commit()
-    conn.close()
+        CREATE TABLE IF NOT EXISTS notes_fts_indexed (
+            note_id INTEGER PRIMARY KEY,
+            content_hash BLOB NOT NULL
+        )
+    ''')
+    _index_all_notes(c)
+
+def _migration_video_transcripts(c):
+    # One row per video, shared by every note saved for it
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS video_transcripts (
+            video_id TEXT PRIMARY KEY,
+            transcript BLOB NOT NULL,
+            transcript_format INTEGER NOT NULL,
+            word_starts BLOB NOT NULL,
+            word_ends BLOB NOT NULL,
+            word_speakers BLOB NOT NULL,
+            word_offsets BLOB NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+# Applied in order; PRAGMA user_version records how many have run
+MIGRATIONS = [
+    _migration_create_notes,
+    _migration_video_id_and_indexes,
+    _migration_keyset_index,
+    _migration_compressed_content,
+    _migration_notes_fts,
+    _migration_video_transcripts,
+]
+
+def init_db():
+    """
+    Initializes the database schema and applies pending migrations, once per process.
+
+    Each migration runs in its own BEGIN IMMEDIATE transaction that re-reads
+    user_version first, so processes racing to start up never apply the same
+    migration twice.
+    """
+    if DB_FILE in _initialized_files:
+        return
+    with _schema_lock:
+        if DB_FILE in _initialized_files:
+            return
+        conn = get_connection()
+        while True:
+            # Take the write lock before reading the version, so when several processes
+            # start at once each migration is applied by exactly one of them
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                if version >= len(MIGRATIONS):
+                    conn.commit()
+                    break
+                MIGRATIONS[version](conn.cursor())
+                conn.execute(f"PRAGMA user_version = {version + 1}")
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        _initialized_files.add(DB_FILE)
+
+def _compress_rows(c, batch_size: int = 500) -> int:
+    """Compresses every plain-text notes body in batches and returns how many were rewritten."""
+    rewritten = 0
+    last_id = 0
+    while True:
+        rows = c.execute(
+            "SELECT id, notes_content FROM notes WHERE content_format = ? AND id > ? ORDER BY id LIMIT ?",
+            (NOTE_FORMAT_TEXT, last_id, batch_size)
+        ).fetchall()
+        if not rows:
+            return rewritten
+        updates = []
+        for note_id, notes_content in rows:
+            stored_value, content_format = encode_note_content(decode_note_content(notes_content, NOTE_FORMAT_TEXT))
+            if content_format != NOTE_FORMAT_TEXT:
+                updates.append((stored_value, content_format, note_id))
+        c.executemany("UPDATE notes SET notes_content = ?, content_format = ? WHERE id = ?", updates)
+        rewritten += len(updates)
+        last_id = rows[-1][0]
+
+def _fts_row_hash(title: str, notes_content: str) -> bytes:
+    return hashlib.sha1(f"{title}\0{notes_content}".encode('utf-8')).digest()
+
+def _fts_insert(c, rows):
+    """Adds (note_id, title, plain_notes_content) rows to the search index."""
+    c.executemany("INSERT INTO notes_fts (rowid, title, notes_content) VALUES (?, ?, ?)", rows)
+    c.executemany(
+        "INSERT OR REPLACE INTO notes_fts_indexed (note_id, content_hash) VALUES (?, ?)",
+        [(note_id, _fts_row_hash(title, notes_content)) for note_id, title, notes_content in rows]
+    )
+
+def _fts_delete(c, rows):
+    """
+    Removes (note_id, title, plain_notes_content) rows from the search index.
+
+    A contentless FTS5 table can only delete a row given the exact values it
+    was indexed with; a 'delete' for anything else corrupts the index. So the
+    delete is only sent for notes recorded in notes_fts_indexed with a matching
+    hash. Notes written or edited by another SQLite client are skipped; their
+    stale entries never match a missing note in search_notes and are cleared
+    by rebuild_search_index.
+    """
+    indexed = {}
+    note_ids = [row[0] for row in rows]
+    for start in range(0, len(note_ids), 500):
+        batch = note_ids[start:start + 500]
+        placeholders = ','.join('?' for _ in batch)
+        indexed.update(c.execute(
+            f"SELECT note_id, content_hash FROM notes_fts_indexed WHERE note_id IN ({placeholders})", batch
+        ).fetchall())
+    c.executemany(
+        "INSERT INTO notes_fts (notes_fts, rowid, title, notes_content) VALUES ('delete', ?, ?, ?)",
+        [row for row in rows if indexed.get(row[0]) == _fts_row_hash(row[1], row[2])]
+    )
+    c.executemany("DELETE FROM notes_fts_indexed WHERE note_id = ?", [(note_id,) for note_id in indexed])
+
+def _index_all_notes(c, batch_size: int = 500) -> int:
+    """Indexes every note for search in batches and returns how many were indexed."""
+    indexed = 0
+    last_id = 0
+    while True:
+        rows = c.execute(
+            "SELECT id, title, notes_content, content_format FROM notes WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, batch_size)
+        ).fetchall()
+        if not rows:
+            return indexed
+        _fts_insert(c, [
+            (note_id, title, decode_note_content(notes_content, content_format) or '')
+            for note_id, title, notes_content, content_format in rows
+        ])
+        indexed += len(rows)
+        last_id = rows[-1][0]
+
+def rebuild_search_index() -> int:
+    """
+    Rebuilds the full-text search index from the notes table.
+
+    Notes are indexed as the app saves, imports and deletes them; this is only
+    needed after the notes table was changed by another SQLite client.
+
+    Returns:
+        int: The number of notes indexed.
+    """
+    init_db()
+    conn = get_connection()
+    with conn:
+        conn.execute("INSERT INTO notes_fts (notes_fts) VALUES ('delete-all')")
+        conn.execute("DELETE FROM notes_fts_indexed")
+        return _index_all_notes(conn.cursor())
+
+def compress_existing_notes(vacuum: bool = False) -> int:
+    """
+    Compresses any notes still stored as plain text.
+
+    Args:
+        vacuum (bool): If True, run VACUUM afterwards so the freed pages are
+            returned to the filesystem.
+
+    Returns:
+        int: The number of notes that were compressed.
+    """
+    init_db()
+    conn = get_connection()
+    with conn:
+        rewritten = _compress_rows(conn.cursor())
+    if vacuum:
+        conn.execute("VACUUM")
+    return rewritten
+
+def get_storage_stats() -> dict:
+    """
+    Reports how much space note compression is saving.
+
+    Returns:
+        dict: `notes`, `compressed_notes`, `plain_bytes` (size of all bodies as
+            UTF-8 text), `stored_bytes` (size as stored), `saved_bytes` and
+            `file_bytes` (size of the database file).
+    """
+    init_db()
+    conn = get_connection()
+    notes, compressed_notes, plain_bytes, stored_bytes = conn.execute('''
+        SELECT COUNT(*),
+               COALESCE(SUM(content_format = ?), 0),
+               COALESCE(SUM(LENGTH(CAST(note_text(notes_content, content_format) AS BLOB))), 0),
+               COALESCE(SUM(LENGTH(CAST(notes_content AS BLOB))), 0)
+        FROM notes
+    ''', (NOTE_FORMAT_ZLIB,)).fetchone()
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return {
+        'notes': notes,
+        'compressed_notes': compressed_notes,
+        'plain_bytes': plain_bytes,
+        'stored_bytes': stored_bytes,
+        'saved_bytes': plain_bytes - stored_bytes,
+        'file_bytes': page_count * page_size
+    }
+
+def save_notes_to_db(title: str, youtube_url: str, summary_level: str, notes_content: str) -> int:
+    """
+    Saves the generated notes to the database, compressing the body when worthwhile,
+    and adds them to the related-notes index.
+
+    Returns:
+        int: The new note's ID.
+    """
+    init_db()
+    conn = get_connection()
+    with span('db.save') as save:
+        stored_value, content_format = encode_note_content(notes_content)
+        if isinstance(stored_value, str):
+            save.set(bytes=len(stored_value.encode('utf-8')))
+        elif stored_value is not None:
+            save.set(bytes=len(stored_value))
+        with conn:
+            note_id = conn.execute('''
+                INSERT INTO notes (title, youtube_url, summary_level, notes_content, content_format, video_id)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (title, youtube_url, summary_level, stored_value, content_format, extract_video_id(youtube_url))).lastrowid
+            _fts_insert(conn, [(note_id, title, notes_content or '')])
+    try:
+        _semantic_index().add([(note_id, _index_text(title, notes_content))])
+    except Exception:
+        # The note is saved; sync_semantic_index picks it up on the next startup
+        logger.warning("Could not add note %s to the related-notes index", note_id, exc_info=True)
+    return note_id
+
+def find_notes_for_video(youtube_url: str, summary_level: str):
+    """
+    Looks up the most recent saved notes for a video and summary level.
+
+    The URL is reduced to its canonical video ID, so short links and links
+    with timestamps match notes saved from any other form of the URL.
+
+    Returns:
+        dict: The matching note with `id`, `title`, `youtube_url`, `summary_level`,
+            `notes_content` and `created_at`, or None if there is none.
+    """
+    video_id = extract_video_id(youtube_url)
+    if video_id is None:
+        return None
+    init_db()
+    conn = get_connection()
+    row = conn.execute('''
+        SELECT id, title, youtube_url, summary_level, note_text(notes_content, content_format), created_at
+        FROM notes
+        WHERE video_id = ? AND summary_level = ?
+        ORDER BY created_at DESC
+        LIMIT 1
+    ''', (video_id, summary_level)).fetchone()
+    if row is None:
+        return None
+    return dict(zip(NOTE_COLUMNS, row))
+
+_SEARCH_TERM_RE = re.compile(r'\w+', re.UNICODE)
+SNIPPET_WORDS = 24
+
+def _build_fts_query(query: str) -> str:
+    """Turns free text into an FTS5 query that prefix-matches every term."""
+    terms = _SEARCH_TERM_RE.findall(query)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+def _make_snippet(text: str, terms: list, max_words: int = SNIPPET_WORDS) -> str:
+    """
+    Picks the run of `max_words` words containing the most query matches.
+
+    The search index is contentless, so FTS5's snippet() has no text to work
+    with; this does the equivalent on the decoded body. A word matches if it
+    starts with one of the query terms.
+
+    Returns:
+        str: The HTML-escaped excerpt with matches wrapped in <mark> tags and
+            an ellipsis where text was cut off.
+    """
+    words = list(_SEARCH_TERM_RE.finditer(text or ''))
+    if not words:
+        return ''
+    prefixes = tuple(term.lower() for term in terms)
+    hits = [index for index, word in enumerate(words) if word.group().lower().startswith(prefixes)]
+
+    first = 0
+    best_count = 0
+    left = 0
+    for right, index in enumerate(hits):
+        while index - hits[left] >= max_words:
+            left += 1
+        if right - left + 1 > best_count:
+            best_count, first = right - left + 1, hits[left]
+    # Lead in with a few words of context before the first match
+    first = max(min(first - 3, len(words) - max_words), 0)
+    last = min(first + max_words, len(words)) - 1
+
+    hit_set = set(hits)
+    parts = ['…' if first else '']
+    position = words[first].start()
+    for index in range(first, last + 1):
+        word = words[index]
+        parts.append(html.escape(text[position:word.start()]))
+        if index in hit_set:
+            parts.append(f"<mark>{html.escape(word.group())}</mark>")
+        else:
+            parts.append(html.escape(word.group()))
+        position = word.end()
+    if last < len(words) - 1:
+        parts.append('…')
+    else:
+        parts.append(html.escape(text[position:].rstrip()))
+    return ''.join(parts)
+
+def search_notes(query: str, limit: int = 20) -> list:
+    """
+    Searches saved notes by title and content using the FTS5 index.
+
+    Every word in the query must match (as a prefix). Results are ranked with
+    BM25, weighting title matches above content matches.
+
+    Args:
+        query (str): Free-text search query.
+        limit (int): Maximum number of results to return.
+
+    Returns:
+        list: Dicts with `id`, `title`, `youtube_url`, `summary_level`, `created_at`
+            and `snippet`, best match first. The snippet is HTML-escaped with
+            matches wrapped in <mark> tags.
+    """
+    fts_query = _build_fts_query(query)
+    if not fts_query:
+        return []
+    init_db()
+    conn = get_connection()
+    terms = _SEARCH_TERM_RE.findall(query)
+    with span('db.search'):
+        rows = conn.execute('''
+            SELECT n.id, n.title, n.youtube_url, n.summary_level, n.created_at,
+                   note_text(n.notes_content, n.content_format)
+            FROM notes_fts
+            JOIN notes n ON n.id = notes_fts.rowid
+            WHERE notes_fts MATCH ?
+            ORDER BY bm25(notes_fts, 10.0, 1.0)
+            LIMIT ?
+        ''', (fts_query, limit)).fetchall()
+
+        results = []
+        for note_id, title, youtube_url, summary_level, created_at, notes_content in rows:
+            results.append({
+                'id': note_id,
+                'title': title,
+                'youtube_url': youtube_url,
+                'summary_level': summary_level,
+                'created_at': created_at,
+                'snippet': _make_snippet(notes_content, terms)
+            })
+    return results
+
+def count_notes() -> int:
+    """Returns the number of saved notes."""
+    init_db()
+    return get_connection().execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+
+def get_notes_page(cursor: tuple = None, limit: int = 20):
+    """
+    Returns one page of note metadata, newest first, using keyset pagination.
+
+    Note bodies are not loaded; fetch them with get_note_content when needed.
+
+    Args:
+        cursor (tuple): The (created_at, id) of the last note on the previous page,
+            or None for the first page.
+        limit (int): Maximum number of notes per page.
+
+    Returns:
+        tuple: (notes, next_cursor), where notes is a list of dicts with
+            NOTE_METADATA_COLUMNS keys and next_cursor is None on the last page.
+    """
+    init_db()
+    conn = get_connection()
+    columns = ', '.join(NOTE_METADATA_COLUMNS)
+    if cursor is None:
+        rows = conn.execute(
+            f"SELECT {columns} FROM notes ORDER BY created_at DESC, id DESC LIMIT ?",
+            (limit + 1,)
+        ).fetchall()
+    else:
+        rows = conn.execute(
+            f"SELECT {columns} FROM notes WHERE (created_at, id) < (?, ?) "
+            "ORDER BY created_at DESC, id DESC LIMIT ?",
+            (cursor[0], cursor[1], limit + 1)
+        ).fetchall()
+
+    notes = [dict(zip(NOTE_METADATA_COLUMNS, row)) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = notes[-1]
+        next_cursor = (last['created_at'], last['id'])
+    return notes, next_cursor
+
+def get_note_content(note_id: int):
+    """Returns the notes body for a single note, or None if it does not exist."""
+    init_db()
+    row = get_connection().execute(
+        "SELECT note_text(notes_content, content_format) FROM notes WHERE id = ?", (note_id,)
+    ).fetchone()
+    return row[0] if row else None
 
 def get_all_notes_from_db():
-    """Retrieves all notes from the database and returns them as a pandas DataFrame."""
+    """Retrieves all notes from the database, newest first, as a list of dicts."""
     if not os.path.exists(DB_FILE):
-        return pd.DataFrame()
-        
-    conn = sqlite3.connect(DB_FILE)
-    df = pd.read_sql_query("SELECT * FROM notes ORDER BY created_at DESC", conn)
-    conn.close()
-    return df
+        return []
+
+    init_db()
+    rows = get_connection().execute(
+        "SELECT id, title, youtube_url, summary_level, note_text(notes_content, content_format), created_at "
+        "FROM notes ORDER BY created_at DESC, id DESC"
+    ).fetchall()
+    return [dict(zip(NOTE_COLUMNS, row)) for row in rows]
+
+def iter_notes(batch_size: int = 500):
+    """
+    Yields every saved note, oldest first, fetching `batch_size` rows at a time.
+
+    Uses keyset pagination on id, so memory use stays constant however many
+    notes there are and no read transaction is held open between batches.
+
+    Yields:
+        dict: A note with NOTE_COLUMNS keys.
+    """
+    init_db()
+    conn = get_connection()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, title, youtube_url, summary_level, note_text(notes_content, content_format), created_at "
+            "FROM notes WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, batch_size)
+        ).fetchall()
+        if not rows:
+            return
+        for row in rows:
+            yield dict(zip(NOTE_COLUMNS, row))
+        last_id = rows[-1][0]
+
+def _insert_note_batch(conn, batch: list) -> int:
+    """Inserts one batch of imported notes in a single transaction, skipping ones already saved."""
+    rows = []
+    with conn:
+        for note in batch:
+            if note.get('created_at') is None:
+                # Without a creation time, only an identical body marks the note as already saved
+                duplicate = conn.execute(
+                    "SELECT 1 FROM notes WHERE youtube_url = ? AND summary_level IS ? AND title = ? "
+                    "AND note_text(notes_content, content_format) IS ?",
+                    (note['youtube_url'], note.get('summary_level'), note['title'], note.get('notes_content'))
+                ).fetchone()
+            else:
+                duplicate = conn.execute(
+                    "SELECT 1 FROM notes WHERE youtube_url = ? AND summary_level IS ? AND created_at = ? AND title = ?",
+                    (note['youtube_url'], note.get('summary_level'), note['created_at'], note['title'])
+                ).fetchone()
+            if duplicate:
+                continue
+            stored_value, content_format = encode_note_content(note.get('notes_content'))
+            note_id = conn.execute('''
+                INSERT INTO notes (title, youtube_url, summary_level, notes_content, content_format, video_id, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+            ''', (
+                note['title'], note['youtube_url'], note.get('summary_level'), stored_value, content_format,
+                extract_video_id(note['youtube_url']), note.get('created_at')
+            )).lastrowid
+            rows.append((note_id, note['title'], note.get('notes_content') or ''))
+        _fts_insert(conn, rows)
+    return len(rows)
+
+def _validate_imported_note(note, position: int):
+    """Raises ValueError unless `note` has the fields and value types import_notes can store."""
+    if not isinstance(note, dict):
+        raise ValueError(f"Note {position} is not an object")
+    if not note.get('title') or not note.get('youtube_url'):
+        raise ValueError(f"Note {position} is missing a title or YouTube URL")
+    for field in ('title', 'youtube_url', 'summary_level', 'notes_content', 'created_at'):
+        value = note.get(field)
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"Note {position} has a {type(value).__name__} for '{field}'; expected text")
+
+def import_notes(notes, batch_size: int = 500) -> dict:
+    """
+    Saves notes from an iterable, committing every `batch_size` notes.
+
+    Notes that match an existing note's title, URL, summary level and creation
+    time are skipped, so re-running an import does not create duplicates. A
+    note without a creation time is skipped if a note with the same title, URL,
+    summary level and body exists.
+
+    Args:
+        notes: Iterable of dicts with at least `title` and `youtube_url`, and
+            optionally `summary_level`, `notes_content` and `created_at`.
+            Any `id` is ignored; imported notes get new IDs.
+        batch_size (int): Notes per transaction.
+
+    Returns:
+        dict: `imported` and `skipped` counts.
+
+    Raises:
+        ValueError: If a note has no title or YouTube URL, or a field that is
+            not text. Batches committed before it are kept.
+    """
+    init_db()
+    conn = get_connection()
+    imported = seen = 0
+    batch = []
+    with span('db.import'):
+        for note in notes:
+            _validate_imported_note(note, seen + 1)
+            batch.append(note)
+            seen += 1
+            if len(batch) >= batch_size:
+                imported += _insert_note_batch(conn, batch)
+                batch = []
+        if batch:
+            imported += _insert_note_batch(conn, batch)
+    if imported:
+        sync_semantic_index()
+    return {'imported': imported, 'skipped': seen - imported}
 
 def delete_notes_from_db(note_ids: list):
     """Deletes notes with the given IDs from the database."""
     if not note_ids:
         return
-    
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+
+    init_db()
+    conn = get_connection()
     placeholders = ','.join('?' for _ in note_ids)
-    c.execute(f"DELETE FROM notes WHERE id IN ({placeholders})", note_ids)
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    with conn:
+        rows = conn.execute(
+            f"SELECT id, title, notes_content, content_format, video_id FROM notes WHERE id IN ({placeholders})",
+            note_ids
+        ).fetchall()
+        _fts_delete(conn, [
+            (note_id, title, decode_note_content(notes_content, content_format) or '')
+            for note_id, title, notes_content, content_format, _ in rows
+        ])
+        conn.execute(f"DELETE FROM notes WHERE id IN ({placeholders})", note_ids)
+        _prune_word_timings(conn)
+    try:
+        _semantic_index().remove(note_ids)
+    except Exception:
+        logger.warning("Could not remove notes %s from the related-notes index", note_ids, exc_info=True)
+
+def _prune_word_timings(conn):
+    """Deletes word timings that no note uses and the transcript cache has already expired."""
+    conn.execute('''
+        DELETE FROM video_transcripts
+        WHERE created_at < datetime('now', ?)
+          AND NOT EXISTS (SELECT 1 FROM notes WHERE notes.video_id = video_transcripts.video_id)
+    ''', (f"-{TRANSCRIPT_RETENTION_SECONDS} seconds",))
+
+def save_word_timings(video_id: str, transcript: str, timings):
+    """
+    Stores a video's transcript and word timings, replacing any saved earlier.
+
+    Args:
+        video_id (str): The canonical YouTube video ID.
+        transcript (str): The transcript text the timing offsets refer to.
+        timings (WordTimings): Per-word start/end times, speakers and offsets.
+    """
+    init_db()
+    conn = get_connection()
+    stored_value, content_format = encode_note_content(transcript)
+    with span('db.save_timings') as save, conn:
+        blobs = timings.to_blobs()
+        save.set(bytes=sum(len(blob) for blob in blobs))
+        conn.execute('''
+            INSERT OR REPLACE INTO video_transcripts
+                (video_id, transcript, transcript_format, word_starts, word_ends, word_speakers, word_offsets)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (video_id, stored_value, content_format, *blobs))
+        _prune_word_timings(conn)
+
+def load_word_timings(video_id: str):
+    """
+    Loads a video's transcript and word timings.
+
+    Returns:
+        tuple: (transcript, WordTimings), or None if none are stored for the video.
+    """
+    from word_timings import WordTimings
+
+    init_db()
+    row = get_connection().execute('''
+        SELECT note_text(transcript, transcript_format), word_starts, word_ends, word_speakers, word_offsets
+        FROM video_transcripts WHERE video_id = ?
+    ''', (video_id,)).fetchone()
+    if row is None:
+        return None
+    return row[0], WordTimings.from_blobs(*row[1:])
+
+def find_video_timestamp(youtube_url: str, passage: str):
+    """
+    Finds when a passage from a video's notes or transcript is spoken.
+
+    Returns:
+        float: Seconds into the video, or None if the video has no stored word
+            timings or the passage cannot be matched.
+    """
+    from word_timings import find_passage_time
+
+    video_id = extract_video_id(youtube_url)
+    stored = load_word_timings(video_id) if video_id else None
+    if stored is None:
+        return None
+    transcript, timings = stored
+    return find_passage_time(transcript, timings, passage)
+
+_HEADING_RE = re.compile(r'^#{1,6}\s+(.+?)\s*#*\s*$', re.MULTILINE)
+
+def get_note_section_timestamps(note_id: int) -> list:
+    """
+    Maps each heading in a saved note to the point in the video it covers.
+
+    Returns:
+        list: (heading, seconds) pairs in note order, for headings whose section
+            could be matched. Empty if the video has no stored word timings.
+    """
+    from word_timings import find_passage_time
+
+    init_db()
+    row = get_connection().execute(
+        "SELECT video_id, note_text(notes_content, content_format) FROM notes WHERE id = ?", (note_id,)
+    ).fetchone()
+    if row is None or row[0] is None or not row[1]:
+        return []
+    stored = load_word_timings(row[0])
+    if stored is None:
+        return []
+    transcript, timings = stored
+
+    notes_content = row[1]
+    headings = list(_HEADING_RE.finditer(notes_content))
+    sections = []
+    for index, heading in enumerate(headings):
+        section_end = headings[index + 1].start() if index + 1 < len(headings) else len(notes_content)
+        seconds = find_passage_time(transcript, timings, notes_content[heading.start():section_end])
+        if seconds is not None:
+            sections.append((heading.group(1), seconds))
+    return sections
+
+def _semantic_index():
+    # numpy is only imported once the index is first needed, keeping app startup light
+    import semantic_index
+    return semantic_index.get_index(DB_FILE)
+
+def _index_text(title: str, notes_content: str) -> str:
+    return f"{title}\n{notes_content or ''}"
+
+def sync_semantic_index(batch_size: int = 200) -> dict:
+    """
+    Brings the related-notes index in line with the notes table.
+
+    Saves and deletes update the index as they happen; this catches notes
+    imported in bulk, saved before the index existed, or missed because
+    indexing failed or raced with another process compacting the index.
+    get_related_notes runs it on first use in each process and again whenever
+    another process has compacted the index.
+
+    Returns:
+        dict: `added` and `removed` counts.
+    """
+    init_db()
+    conn = get_connection()
+    index = _semantic_index()
+    note_ids = {row[0] for row in conn.execute("SELECT id FROM notes")}
+    indexed_ids = index.note_ids()
+
+    stale_ids = indexed_ids - note_ids
+    if stale_ids:
+        index.remove(stale_ids)
+
+    missing_ids = sorted(note_ids - indexed_ids)
+    for start in range(0, len(missing_ids), batch_size):
+        batch = missing_ids[start:start + batch_size]
+        placeholders = ','.join('?' for _ in batch)
+        rows = conn.execute(
+            f"SELECT id, title, note_text(notes_content, content_format) FROM notes WHERE id IN ({placeholders})",
+            batch
+        ).fetchall()
+        index.add([(note_id, _index_text(title, notes_content)) for note_id, title, notes_content in rows])
+    return {'added': len(missing_ids), 'removed': len(stale_ids)}
+
+def get_related_notes(note_id: int, limit: int = 5) -> list:
+    """
+    Finds saved notes on topics similar to the given note.
+
+    Similarity is the cosine between TF-IDF weighted bag-of-words vectors,
+    computed locally from the note titles and content.
+
+    Returns:
+        list: Dicts with NOTE_METADATA_COLUMNS keys plus `score`, most similar first.
+    """
+    index = _semantic_index()
+    generation = index.generation()
+    if _synced_index_generations.get(DB_FILE) != generation:
+        sync_semantic_index()
+        _synced_index_generations[DB_FILE] = generation
+    with span('db.related'):
+        matches = index.related(note_id, k=limit)
+    if not matches:
+        return []
+    conn = get_connection()
+    placeholders = ','.join('?' for _ in matches)
+    rows = conn.execute(
+        f"SELECT {', '.join(NOTE_METADATA_COLUMNS)} FROM notes WHERE id IN ({placeholders})",
+        [match_id for match_id, _ in matches]
+    ).fetchall()
+    notes = {row[0]: dict(zip(NOTE_METADATA_COLUMNS, row)) for row in rows}
+    return [
+        {**notes[match_id], 'score': score}
+        for match_id, score in matches
+        if match_id in notes
+    ]
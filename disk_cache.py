@@ -0,0 +1,135 @@
+import json
+import hashlib
+import sqlite3
+import threading
+import time
+
+class DiskCache:
+    """
+    A persistent, size-bounded key/value cache backed by a SQLite file.
+
+    Entries are evicted when they are older than `ttl_seconds`, and the least
+    recently used entries are evicted whenever the total stored size exceeds
+    `max_bytes`. Hit and miss counts are kept for the lifetime of the process.
+    """
+
+    def __init__(self, db_file: str, max_bytes: int, ttl_seconds: float = None):
+        self.db_file = db_file
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._init_db()
+
+    @staticmethod
+    def make_key(*parts, **params) -> str:
+        """Builds a stable cache key from positional parts and keyword parameters."""
+        raw = json.dumps([list(parts), params], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_file, timeout=30.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    cache_key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_access ON cache_entries (last_access)")
+        conn.close()
+
+    def get(self, key: str):
+        """Returns the cached value for `key`, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT value, created_at FROM cache_entries WHERE cache_key = ?", (key,)
+                ).fetchone()
+                if row is not None and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                    with conn:
+                        conn.execute("DELETE FROM cache_entries WHERE cache_key = ?", (key,))
+                    row = None
+                if row is None:
+                    self.misses += 1
+                    return None
+                with conn:
+                    conn.execute("UPDATE cache_entries SET last_access = ? WHERE cache_key = ?", (now, key))
+                self.hits += 1
+                return row[0]
+            finally:
+                conn.close()
+
+    def put(self, key: str, value: str):
+        """Stores `value` under `key` and evicts entries to stay within the budget."""
+        size_bytes = len(value.encode('utf-8'))
+        if size_bytes > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute('''
+                        INSERT OR REPLACE INTO cache_entries (cache_key, value, size_bytes, created_at, last_access)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', (key, value, size_bytes, now, now))
+                    self._evict(conn, now)
+            finally:
+                conn.close()
+
+    def delete(self, key: str):
+        """Removes a single entry from the cache."""
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute("DELETE FROM cache_entries WHERE cache_key = ?", (key,))
+            finally:
+                conn.close()
+
+    def _evict(self, conn, now: float):
+        if self.ttl_seconds is not None:
+            conn.execute("DELETE FROM cache_entries WHERE created_at < ?", (now - self.ttl_seconds,))
+
+        total_bytes = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM cache_entries").fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+
+        stale_keys = []
+        for cache_key, size_bytes in conn.execute(
+            "SELECT cache_key, size_bytes FROM cache_entries ORDER BY last_access ASC"
+        ):
+            if total_bytes <= self.max_bytes:
+                break
+            stale_keys.append((cache_key,))
+            total_bytes -= size_bytes
+        conn.executemany("DELETE FROM cache_entries WHERE cache_key = ?", stale_keys)
+
+    def stats(self) -> dict:
+        """Returns hit/miss counts along with the current entry count and stored size."""
+        conn = self._connect()
+        try:
+            entries, total_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM cache_entries"
+            ).fetchone()
+        finally:
+            conn.close()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': entries,
+            'bytes': total_bytes,
+            'max_bytes': self.max_bytes,
+        }
@@ -0,0 +1,219 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from youtube_utils import extract_video_id
+
+JOBS_DB_FILE = "jobs.db"
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# A running job whose heartbeat is older than this is assumed to belong to a crashed worker
+JOB_STALE_SECONDS = 120
+JOB_MAX_ATTEMPTS = 3
+# A finished job's summary is handed to new requests for the same video and level for this long
+JOB_RESULT_REUSE_SECONDS = 3600
+
+JOB_COLUMNS = (
+    'id', 'youtube_url', 'title', 'summary_level', 'status', 'stage', 'progress',
+    'result', 'error', 'attempts', 'worker_id', 'created_at', 'started_at',
+    'heartbeat_at', 'finished_at', 'video_id', 'partial_result'
+)
+
+_local = threading.local()
+
+def get_connection() -> sqlite3.Connection:
+    """Returns this thread's connection to JOBS_DB_FILE, creating the schema on first use."""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.db_file == JOBS_DB_FILE:
+        return conn
+
+    conn = sqlite3.connect(JOBS_DB_FILE, timeout=30.0, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            youtube_url TEXT NOT NULL,
+            title TEXT,
+            summary_level TEXT NOT NULL,
+            status TEXT NOT NULL,
+            stage TEXT,
+            progress REAL NOT NULL DEFAULT 0,
+            result TEXT,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            worker_id TEXT,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            heartbeat_at REAL,
+            finished_at REAL
+        )
+    ''')
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]
+    for column in ('video_id', 'partial_result'):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_id ON jobs (status, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_video_level ON jobs (video_id, summary_level, status)")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS workers (
+            worker_id TEXT PRIMARY KEY,
+            last_seen REAL NOT NULL
+        )
+    ''')
+    _local.conn = conn
+    _local.db_file = JOBS_DB_FILE
+    return conn
+
+def make_worker_id() -> str:
+    """Returns an identifier for the calling worker process."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def enqueue_job(youtube_url: str, title: str, summary_level: str) -> int:
+    """
+    Adds a transcribe-and-summarize job to the queue and returns its ID.
+
+    If a job for the same video and summary level is already queued or running,
+    or finished successfully within JOB_RESULT_REUSE_SECONDS, its ID is returned
+    instead so every requester shares one pipeline run. Failed jobs are never
+    reused.
+    """
+    video_id = extract_video_id(youtube_url)
+    conn = get_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if video_id is not None:
+            existing = conn.execute('''
+                SELECT id FROM jobs
+                WHERE video_id = ? AND summary_level = ?
+                  AND (status IN (?, ?) OR (status = ? AND finished_at >= ?))
+                ORDER BY id DESC LIMIT 1
+            ''', (video_id, summary_level, JOB_QUEUED, JOB_RUNNING, JOB_DONE,
+                  time.time() - JOB_RESULT_REUSE_SECONDS)).fetchone()
+            if existing is not None:
+                conn.execute("COMMIT")
+                return existing[0]
+        cursor = conn.execute(
+            "INSERT INTO jobs (youtube_url, title, summary_level, status, stage, created_at, video_id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (youtube_url, title, summary_level, JOB_QUEUED, "Waiting for a worker", time.time(), video_id)
+        )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return cursor.lastrowid
+
+def get_job(job_id: int):
+    """Returns a job as a dict with JOB_COLUMNS keys, or None if it does not exist."""
+    row = get_connection().execute(
+        f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+    ).fetchone()
+    return dict(zip(JOB_COLUMNS, row)) if row else None
+
+def claim_next_job(worker_id: str):
+    """
+    Atomically marks the oldest queued job as running for `worker_id`.
+
+    Returns:
+        dict: The claimed job, or None if the queue is empty.
+    """
+    conn = get_connection()
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT id FROM jobs WHERE status = ? ORDER BY id LIMIT 1", (JOB_QUEUED,)
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        conn.execute('''
+            UPDATE jobs
+            SET status = ?, stage = ?, worker_id = ?, attempts = attempts + 1,
+                started_at = ?, heartbeat_at = ?, error = NULL
+            WHERE id = ?
+        ''', (JOB_RUNNING, "Starting", worker_id, now, now, row[0]))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return get_job(row[0])
+
+def update_progress(job_id: int, stage: str, progress: float):
+    """Records the current stage and fractional progress (0-1) of a running job."""
+    get_connection().execute(
+        "UPDATE jobs SET stage = ?, progress = ?, heartbeat_at = ? WHERE id = ? AND status = ?",
+        (stage, progress, time.time(), job_id, JOB_RUNNING)
+    )
+
+def update_partial_result(job_id: int, partial_result: str):
+    """Stores the summary generated so far, so the app can render it while the job runs."""
+    get_connection().execute(
+        "UPDATE jobs SET partial_result = ?, heartbeat_at = ? WHERE id = ? AND status = ?",
+        (partial_result, time.time(), job_id, JOB_RUNNING)
+    )
+
+def complete_job(job_id: int, result: str):
+    """Marks a job as done and stores its summary."""
+    get_connection().execute(
+        "UPDATE jobs SET status = ?, stage = ?, progress = 1, result = ?, partial_result = NULL, finished_at = ? "
+        "WHERE id = ?",
+        (JOB_DONE, "Done", result, time.time(), job_id)
+    )
+
+def fail_job(job_id: int, error: str):
+    """Marks a job as failed with an error message."""
+    get_connection().execute(
+        "UPDATE jobs SET status = ?, stage = ?, error = ?, finished_at = ? WHERE id = ?",
+        (JOB_FAILED, "Failed", error, time.time(), job_id)
+    )
+
+def heartbeat_worker(worker_id: str):
+    """Records that a worker process is alive."""
+    get_connection().execute(
+        "INSERT OR REPLACE INTO workers (worker_id, last_seen) VALUES (?, ?)", (worker_id, time.time())
+    )
+
+def count_live_workers(max_age_seconds: float = 30.0) -> int:
+    """Returns how many workers have sent a heartbeat within `max_age_seconds`."""
+    return get_connection().execute(
+        "SELECT COUNT(*) FROM workers WHERE last_seen >= ?", (time.time() - max_age_seconds,)
+    ).fetchone()[0]
+
+def recover_stale_jobs(stale_seconds: float = None, max_attempts: int = None) -> int:
+    """
+    Re-queues running jobs whose worker stopped sending heartbeats.
+
+    Jobs that have already used `max_attempts` attempts are marked as failed
+    instead, so a job that crashes its worker cannot loop forever.
+
+    Returns:
+        int: The number of jobs recovered or failed.
+    """
+    stale_seconds = JOB_STALE_SECONDS if stale_seconds is None else stale_seconds
+    max_attempts = max_attempts or JOB_MAX_ATTEMPTS
+    cutoff = time.time() - stale_seconds
+    conn = get_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        failed = conn.execute('''
+            UPDATE jobs SET status = ?, stage = ?, error = ?, finished_at = ?
+            WHERE status = ? AND heartbeat_at < ? AND attempts >= ?
+        ''', (JOB_FAILED, "Failed", "Worker stopped responding", time.time(), JOB_RUNNING, cutoff, max_attempts)).rowcount
+        requeued = conn.execute('''
+            UPDATE jobs SET status = ?, stage = ?, worker_id = NULL, progress = 0
+            WHERE status = ? AND heartbeat_at < ?
+        ''', (JOB_QUEUED, "Retrying after worker failure", JOB_RUNNING, cutoff)).rowcount
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return failed + requeued
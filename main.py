@@ -1,17 +1,35 @@
 import streamlit as st
 import os
 import io
+import html
+import time
+import sqlite3
+import tempfile
+import zipfile
 from datetime import datetime
 
-# Import modules directly from the same directory
-from transcriber import transcribe_youtube_video
-from summarizer import summarize_text
-from database import init_db, save_notes_to_db, get_all_notes_from_db, delete_notes_from_db
+# Import modules directly from the same directory.
+# The transcribe/summarize pipeline runs in worker.py processes, so the app never
+# imports yt_dlp, httpx or google.generativeai.
+from database import (
+    init_db, save_notes_to_db, delete_notes_from_db, find_notes_for_video, search_notes,
+    count_notes, get_notes_page, get_note_content, get_related_notes, find_video_timestamp,
+    get_note_section_timestamps
+)
 from styles import apply_custom_styles
+from notes_renderer import render_notes_html, style_from_session
+from notes_export import write_export, import_notes_file, format_for_path
+from metrics import get_recent_runs, get_stage_stats, export_prometheus
+from word_timings import format_timestamp
+from youtube_utils import extract_video_id, timestamp_url
+from job_queue import enqueue_job, get_job, count_live_workers, JOB_DONE, JOB_FAILED
 
 # Initialize the database
 init_db()
 
+JOB_POLL_SECONDS = 2
+STREAM_POLL_SECONDS = 0.5
+
 st.set_page_config(
     page_title="Academic YouTube Notes Summarizer",
     page_icon="📄",
@@ -49,7 +67,9 @@ if 'notes_title' not in st.session_state: st.session_state.notes_title = ""
 if 'summary_level' not in st.session_state: st.session_state.summary_level = "moderate"
 if 'summarized_notes' not in st.session_state: st.session_state.summarized_notes = ""
 if 'transcript' not in st.session_state: st.session_state.transcript = ""
+if 'active_job_id' not in st.session_state: st.session_state.active_job_id = None
 if 'page' not in st.session_state: st.session_state.page = "Summarize Video"
+if 'notes_page_cursors' not in st.session_state: st.session_state.notes_page_cursors = [None]
 
 # Initialize all customization options in session state with defaults
 if 'title_font_size' not in st.session_state: st.session_state.title_font_size = 40
@@ -75,7 +95,7 @@ st.markdown("<h1 class='title-style'>YouTube Notes Summarizer</h1>", unsafe_allo
 st.markdown("<p>Easily generate notes from academic YouTube videos.</p>", unsafe_allow_html=True)
 
 # --- NAVIGATION BUTTONS ---
-col1, col2 = st.columns(2)
+col1, col2, col3 = st.columns(3)
 with col1:
     if st.button("Summarize Video", use_container_width=True, key="nav_summarize"):
         st.session_state.page = "Summarize Video"
@@ -84,6 +104,10 @@ with col2:
     if st.button("View Saved Notes", use_container_width=True, key="nav_saved"):
         st.session_state.page = "View Saved Notes"
         st.rerun()
+with col3:
+    if st.button("Pipeline Metrics", use_container_width=True, key="nav_metrics"):
+        st.session_state.page = "Pipeline Metrics"
+        st.rerun()
 
 st.markdown("---")
 
@@ -145,104 +169,49 @@ if st.session_state.page == "Summarize Video":
         st.session_state.notes_title = notes_title if notes_title else "Untitled Notes"
         st.session_state.summary_level = summary_level
         
-        with st.spinner("Transcribing video..."):
-            transcript = transcribe_youtube_video(youtube_url)
+        stored_notes = find_notes_for_video(youtube_url, summary_level)
+        if stored_notes:
+            st.session_state.summarized_notes = stored_notes['notes_content']
+            st.info(f"Loaded your saved {summary_level} notes for this video (saved {stored_notes['created_at']}).")
+        else:
+            st.session_state.active_job_id = enqueue_job(youtube_url, st.session_state.notes_title, summary_level)
+            st.session_state.summarized_notes = ""
 
-        if transcript:
-            st.session_state.transcript = transcript
-            st.success("Transcription complete! Now summarizing notes...")
-            with st.spinner("Summarizing notes with Gemini..."):
-                summarized_notes = summarize_text(transcript, summary_level)
-            
-            if summarized_notes:
-                st.session_state.summarized_notes = summarized_notes
-            else:
-                st.error("Failed to generate notes. Please check the API keys and try again.")
+    # Poll the background job until a worker finishes it
+    if st.session_state.active_job_id is not None:
+        job = get_job(st.session_state.active_job_id)
+        if job is None:
+            st.session_state.active_job_id = None
+        elif job['status'] == JOB_DONE:
+            st.session_state.summarized_notes = job['result']
+            st.session_state.active_job_id = None
+            st.success("Notes generated!")
+        elif job['status'] == JOB_FAILED:
+            st.session_state.active_job_id = None
+            st.error(f"{job['error']}\n\nPlease check the YouTube link or API keys and try again.")
         else:
-            st.error("Failed to transcribe the video. Please check the YouTube link or API keys.")
+            st.progress(job['progress'], text=job['stage'])
+            if count_live_workers() == 0:
+                st.warning("No workers are running. Start them with `python worker.py` to process this request.")
+            if job['partial_result']:
+                # Render the summary as it streams in; it is styled once the job completes
+                with st.container(border=True):
+                    st.markdown(job['partial_result'])
+                time.sleep(STREAM_POLL_SECONDS)
+            else:
+                time.sleep(JOB_POLL_SECONDS)
+            st.rerun()
 
     if st.session_state.summarized_notes:
         st.markdown("<h2 class='notes-heading-style'>Generated Notes</h2>", unsafe_allow_html=True)
         
-        # Use stored styling preferences
-        title_font_size = st.session_state.title_font_size
-        notes_font_size = st.session_state.notes_font_size
-        notes_font_style = st.session_state.notes_font_style
-        title_color = st.session_state.title_color
-        notes_color = st.session_state.notes_color
-        title_font_family = st.session_state.title_font_family
-        line_height = st.session_state.line_height
-        font_weight = st.session_state.font_weight
-        container_width = st.session_state.container_width
-        padding = st.session_state.padding
-        margin_bottom = st.session_state.margin_bottom
-        border_radius = st.session_state.border_radius
-        text_alignment = st.session_state.text_alignment
-        title_alignment = st.session_state.title_alignment
-        background_color = st.session_state.background_color
-        border_color = st.session_state.border_color
-        accent_color = st.session_state.accent_color
-        shadow_intensity = st.session_state.shadow_intensity
-        
-        # Process the title
-        display_title = st.session_state.notes_title
-
-        # Process the content
-        content = st.session_state.summarized_notes
-        
-        # Set shadow based on intensity
-        shadow_styles = {
-            'none': 'none',
-            'light': '0 2px 4px rgba(0,0,0,0.1)',
-            'medium': '0 4px 8px rgba(0,0,0,0.15)',
-            'strong': '0 8px 16px rgba(0,0,0,0.2)'
-        }
-        
-        notes_html = f"""
-        <style>
-        .notes-container {{
-            width: {container_width}%;
-            margin: 20px auto;
-            max-width: 1200px;
-        }}
-        .dynamic-notes-title {{
-            font-family: {title_font_family};
-            font-size: {title_font_size}px;
-            color: {title_color};
-            font-weight: bold;
-            margin-bottom: 20px;
-            margin-top: 10px;
-            text-align: {title_alignment};
-        }}
-        .dynamic-notes-content {{
-            font-family: {notes_font_style};
-            font-size: {notes_font_size}px;
-            color: {notes_color};
-            line-height: {line_height};
-            font-weight: {font_weight};
-            text-align: {text_alignment};
-        }}
-        .dynamic-notes-content p {{
-            margin-bottom: {margin_bottom}px;
-        }}
-        .main-notes-area {{
-            background-color: {background_color};
-            padding: {padding}px;
-            border-radius: {border_radius}px;
-            border: 1px solid {border_color};
-            margin: 20px 0;
-            box-shadow: {shadow_styles[shadow_intensity]};
-        }}
-        </style>
-        <div class="notes-container">
-            <div class="main-notes-area">
-                <div class="dynamic-notes-title">{display_title}</div>
-                <div class="dynamic-notes-content">
-                    <p>{content}</p>
-                </div>
-            </div>
-        </div>
-        """
+        # Compiled CSS and converted Markdown are cached per (content, style), so
+        # reruns that change nothing do no render work
+        notes_html = render_notes_html(
+            st.session_state.notes_title,
+            st.session_state.summarized_notes,
+            style_from_session(st.session_state)
+        )
         st.markdown(notes_html, unsafe_allow_html=True)
         st.markdown("---")
 
@@ -273,40 +242,139 @@ elif st.session_state.page == "View Saved Notes":
     st.markdown("<h1 class='notes-heading-style'>Saved Academic Notes</h1>", unsafe_allow_html=True)
     st.write("Browse and manage all your notes stored in the database.")
     
-    notes_df = get_all_notes_from_db()
+    with st.expander("Export or import notes"):
+        export_format = st.radio(
+            "Export format",
+            options=["jsonl", "markdown"],
+            format_func={"jsonl": "JSON Lines (.jsonl)", "markdown": "Markdown files (.zip)"}.__getitem__,
+            horizontal=True
+        )
+        if st.button("Prepare export"):
+            suffix = ".zip" if export_format == "markdown" else ".jsonl"
+            previous_export = st.session_state.pop("export_file", None)
+            if previous_export:
+                previous_export[0].close()
+            # Notes are streamed to an unnamed temporary file rather than built up in memory;
+            # the OS removes it once it is closed or the app exits, so nothing is left on disk
+            export_file = tempfile.TemporaryFile()
+            try:
+                exported = write_export(export_file, export_format)
+            except (sqlite3.Error, OSError) as e:
+                export_file.close()
+                st.error(f"Could not export notes: {e}")
+            else:
+                st.session_state.export_file = (export_file, suffix, exported)
+        
+        def discard_export():
+            # The download has been served, so later reruns stop re-reading the export into memory
+            export_file = st.session_state.pop("export_file", None)
+            if export_file:
+                export_file[0].close()
+        
+        if st.session_state.get("export_file"):
+            export_file, suffix, exported = st.session_state.export_file
+            export_file.seek(0)
+            st.download_button(
+                label=f"Download {exported} note(s)",
+                data=export_file.read(),
+                file_name=f"notes_{datetime.now().strftime('%Y%m%d')}{suffix}",
+                mime="application/zip" if suffix == ".zip" else "application/jsonl",
+                on_click=discard_export
+            )
+        
+        uploaded_file = st.file_uploader("Import notes from a JSONL or Markdown zip export", type=["jsonl", "zip"])
+        if uploaded_file is not None and st.button("Import notes"):
+            try:
+                result = import_notes_file(uploaded_file, format_for_path(uploaded_file.name))
+            except (ValueError, zipfile.BadZipFile, UnicodeDecodeError, sqlite3.Error) as e:
+                st.error(f"Could not import notes: {e}")
+            else:
+                st.session_state.notes_page_cursors = [None]
+                st.success(f"Imported {result['imported']} note(s), skipped {result['skipped']} already saved.")
+    
+    search_query = st.text_input("Search notes", placeholder="Search titles and note content...")
+    if search_query.strip():
+        search_results = search_notes(search_query)
+        st.caption(f"{len(search_results)} matching note(s)")
+        for result in search_results:
+            with st.container(border=True):
+                st.markdown(f"<h3 style='color: #21618C; margin-top: 0;'>{html.escape(result['title'])}</h3>", unsafe_allow_html=True)
+                st.markdown(f"**Created:** {html.escape(str(result['created_at']))}<br>**Summary Level:** {html.escape(result['summary_level'])}<br>"
+                            f"**Video:** <a href='{html.escape(result['youtube_url'])}' target='_blank'>Watch on YouTube</a>", unsafe_allow_html=True)
+                st.markdown(f"<p>{result['snippet']}</p>", unsafe_allow_html=True)
+                snippet_text = html.unescape(result['snippet'].replace('<mark>', '').replace('</mark>', '')).replace('…', ' ')
+                seconds = find_video_timestamp(result['youtube_url'], snippet_text)
+                if seconds is not None:
+                    st.markdown(f"<a href='{timestamp_url(extract_video_id(result['youtube_url']), seconds)}' target='_blank'>"
+                                f"Jump to {format_timestamp(seconds)} in the video</a>", unsafe_allow_html=True)
+        st.markdown("---")
+    
+    NOTES_PER_PAGE = 20
+    total_notes = count_notes()
     
-    if not notes_df.empty:
-        for index, row in notes_df.iterrows():
+    if total_notes:
+        page_index = len(st.session_state.notes_page_cursors) - 1
+        notes_page, next_cursor = get_notes_page(st.session_state.notes_page_cursors[-1], limit=NOTES_PER_PAGE)
+        
+        for note in notes_page:
             with st.container(border=True):
-                st.markdown(f"<h3 style='color: #21618C; margin-top: 0;'>{row['title']}</h3>", unsafe_allow_html=True)
-                st.markdown(f"**Created:** {row['created_at']}<br>**Summary Level:** {row['summary_level']}<br>**Video:** <a href='{row['youtube_url']}' target='_blank'>Watch on YouTube</a>", unsafe_allow_html=True)
-                
-                with st.expander("View Notes Content"):
-                    st.markdown(row['notes_content'])
+                st.markdown(f"<h3 style='color: #21618C; margin-top: 0;'>{html.escape(note['title'])}</h3>", unsafe_allow_html=True)
+                st.markdown(f"**Created:** {html.escape(str(note['created_at']))}<br>**Summary Level:** {html.escape(note['summary_level'])}<br>"
+                            f"**Video:** <a href='{html.escape(note['youtube_url'])}' target='_blank'>Watch on YouTube</a>", unsafe_allow_html=True)
                 
-                st.download_button(
-                    label="Download this note",
-                    data=row['notes_content'],
-                    file_name=f"{row['title'].replace(' ', '_')}.txt",
-                    mime="text/plain",
-                    key=f"download_{row['id']}"
-                )
+                # Note bodies are only loaded once the user opens them
+                if st.toggle("Show notes content", key=f"show_{note['id']}"):
+                    notes_content = get_note_content(note['id']) or ""
+                    
+                    section_timestamps = get_note_section_timestamps(note['id'])
+                    if section_timestamps:
+                        video_id = extract_video_id(note['youtube_url'])
+                        with st.expander("Jump to a section in the video"):
+                            for heading, seconds in section_timestamps:
+                                st.markdown(f"- <a href='{timestamp_url(video_id, seconds)}' target='_blank'>{format_timestamp(seconds)}</a> "
+                                            f"{html.escape(heading)}", unsafe_allow_html=True)
+                    
+                    st.markdown(notes_content)
+                    st.download_button(
+                        label="Download this note",
+                        data=notes_content,
+                        file_name=f"{note['title'].replace(' ', '_')}.txt",
+                        mime="text/plain",
+                        key=f"download_{note['id']}"
+                    )
+                    
+                    related_notes = get_related_notes(note['id'])
+                    if related_notes:
+                        st.markdown("**Related notes**")
+                        for related in related_notes:
+                            st.markdown(f"- <a href='{html.escape(related['youtube_url'])}' target='_blank'>{html.escape(related['title'])}</a> "
+                                        f"({related['summary_level']}, {related['score']:.0%} similar)", unsafe_allow_html=True)
+        
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if st.button("Previous page", disabled=page_index == 0, use_container_width=True):
+                st.session_state.notes_page_cursors.pop()
+                st.rerun()
+        with col2:
+            first_shown = page_index * NOTES_PER_PAGE + 1
+            st.caption(f"Showing notes {first_shown}-{first_shown + len(notes_page) - 1} of {total_notes}")
+        with col3:
+            if st.button("Next page", disabled=next_cursor is None, use_container_width=True):
+                st.session_state.notes_page_cursors.append(next_cursor)
+                st.rerun()
         
         st.markdown("---")
         
         st.subheader("Delete Notes")
-        note_options = []
-        for index, row in notes_df.iterrows():
-            created_date = row['created_at'][:10] if row['created_at'] else "Unknown date"
-            note_options.append({
-                'id': row['id'],
-                'display': f"{row['title']} (Created: {created_date})"
-            })
+        note_labels = {
+            note['id']: f"{note['title']} (Created: {note['created_at'][:10] if note['created_at'] else 'Unknown date'})"
+            for note in notes_page
+        }
         
         selected_notes = st.multiselect(
             "Select notes to delete:",
-            options=[note['id'] for note in note_options],
-            format_func=lambda x: next(note['display'] for note in note_options if note['id'] == x),
+            options=list(note_labels),
+            format_func=note_labels.__getitem__,
             placeholder="Choose notes to delete..."
         )
         
@@ -314,8 +382,71 @@ elif st.session_state.page == "View Saved Notes":
             st.warning(f"You are about to delete {len(selected_notes)} note(s). This action cannot be undone.")
             if st.button("Delete Selected Notes", type="secondary"):
                 delete_notes_from_db(selected_notes)
+                st.session_state.notes_page_cursors = [None]
                 st.success(f"Successfully deleted {len(selected_notes)} note(s)!")
                 st.rerun()
             
     else:
-        st.info("You haven't saved any notes yet. Go to the 'Summarize Video' page to create some!")
\ No newline at end of file
+        st.info("You haven't saved any notes yet. Go to the 'Summarize Video' page to create some!")
+
+# --- PIPELINE METRICS PAGE ---
+elif st.session_state.page == "Pipeline Metrics":
+    st.markdown("<h1 class='notes-heading-style'>Pipeline Metrics</h1>", unsafe_allow_html=True)
+    st.write("Where the time goes in recent transcription and summarization runs.")
+
+    window_label = st.selectbox("Time window", ["Last hour", "Last 24 hours", "Last 7 days", "All time"], index=1)
+    window_seconds = {"Last hour": 3600, "Last 24 hours": 86400, "Last 7 days": 604800, "All time": None}[window_label]
+
+    stage_stats = get_stage_stats(since_seconds=window_seconds)
+    if stage_stats:
+        st.subheader("Stage Percentiles (ms)")
+        st.dataframe(
+            [
+                {
+                    "Stage": stage['stage'],
+                    "Count": stage['count'],
+                    "Errors": stage['errors'],
+                    "p50": round(stage['p50'], 1),
+                    "p90": round(stage['p90'], 1),
+                    "p95": round(stage['p95'], 1),
+                    "p99": round(stage['p99'], 1),
+                    "MB": round(stage['bytes'] / (1 << 20), 2),
+                    "Tokens": stage['tokens'],
+                    "Cache Hits": stage['cache_hits'],
+                    "Cache Misses": stage['cache_misses']
+                }
+                for stage in stage_stats
+            ],
+            use_container_width=True,
+            hide_index=True
+        )
+    else:
+        st.info("No pipeline metrics recorded in this time window yet.")
+
+    recent_runs = get_recent_runs(limit=20)
+    if recent_runs:
+        st.subheader("Recent Runs")
+        st.dataframe(
+            [
+                {
+                    "Started": run['started_at'],
+                    "Video": run['label'],
+                    "Status": "ok" if run['ok'] else "failed",
+                    "Total (ms)": round(run['duration_ms'], 1),
+                    **{stage: round(duration, 1) for stage, duration in run['stages'].items()}
+                }
+                for run in recent_runs
+            ],
+            use_container_width=True,
+            hide_index=True
+        )
+
+    with st.expander("Prometheus export"):
+        prometheus_text = export_prometheus()
+        st.code(prometheus_text, language="text")
+        st.download_button(
+            label="Download metrics.prom",
+            data=prometheus_text,
+            file_name="metrics.prom",
+            mime="text/plain"
+        )
@@ -0,0 +1,263 @@
+import sqlite3
+import threading
+import time
+import uuid
+import contextvars
+from contextlib import contextmanager
+
+METRICS_DB_FILE = "metrics.db"
+# Oldest spans are pruned once the store grows past this many rows
+METRICS_MAX_SPANS = 50000
+PERCENTILES = (50, 90, 95, 99)
+
+_current_run = contextvars.ContextVar('metrics_run', default=None)
+_lock = threading.Lock()
+_conn = None
+_conn_file = None
+_spans_since_prune = 0
+
+class Span:
+    """A timed pipeline stage. Attach measurements with `set` while the span is open."""
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.bytes = None
+        self.tokens = None
+        self.cache_hit = None
+        self.ok = True
+
+    def set(self, bytes: int = None, tokens: int = None, cache_hit: bool = None):
+        """Records byte counts, token counts or a cache hit/miss for this span."""
+        if bytes is not None:
+            self.bytes = bytes
+        if tokens is not None:
+            self.tokens = tokens
+        if cache_hit is not None:
+            self.cache_hit = cache_hit
+
+class Run:
+    """A pipeline run. Set `ok` to False to record a failure that did not raise."""
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.ok = True
+
+def _get_connection() -> sqlite3.Connection:
+    global _conn, _conn_file
+    if _conn is None or _conn_file != METRICS_DB_FILE:
+        _conn = sqlite3.connect(METRICS_DB_FILE, timeout=30.0, check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        with _conn:
+            _conn.execute('''
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    label TEXT,
+                    started_at REAL NOT NULL,
+                    duration_ms REAL,
+                    ok INTEGER
+                )
+            ''')
+            _conn.execute('''
+                CREATE TABLE IF NOT EXISTS spans (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    run_id TEXT,
+                    stage TEXT NOT NULL,
+                    started_at REAL NOT NULL,
+                    duration_ms REAL NOT NULL,
+                    bytes INTEGER,
+                    tokens INTEGER,
+                    cache_hit INTEGER,
+                    ok INTEGER NOT NULL
+                )
+            ''')
+            _conn.execute("CREATE INDEX IF NOT EXISTS idx_spans_stage ON spans (stage, started_at)")
+            _conn.execute("CREATE INDEX IF NOT EXISTS idx_spans_run ON spans (run_id)")
+            _conn.execute("CREATE INDEX IF NOT EXISTS idx_runs_started_at ON runs (started_at)")
+        _conn_file = METRICS_DB_FILE
+    return _conn
+
+def _write(sql: str, params: tuple):
+    # Metrics must never break the pipeline, so storage errors are swallowed
+    try:
+        with _lock:
+            conn = _get_connection()
+            with conn:
+                conn.execute(sql, params)
+    except sqlite3.Error:
+        pass
+
+def _prune():
+    try:
+        with _lock:
+            conn = _get_connection()
+            with conn:
+                conn.execute(
+                    "DELETE FROM spans WHERE id <= (SELECT MAX(id) FROM spans) - ?", (METRICS_MAX_SPANS,)
+                )
+                conn.execute("DELETE FROM runs WHERE run_id NOT IN (SELECT DISTINCT run_id FROM spans WHERE run_id IS NOT NULL)")
+    except sqlite3.Error:
+        pass
+
+@contextmanager
+def pipeline_run(kind: str, label: str = None):
+    """
+    Groups the spans recorded inside the block into one pipeline run.
+
+    Args:
+        kind (str): The kind of run, e.g. 'generate_notes'.
+        label (str): Optional description, e.g. the video URL.
+
+    Yields:
+        Run: The run, whose `ok` flag is recorded when the block exits.
+    """
+    run = Run(uuid.uuid4().hex)
+    token = _current_run.set(run.run_id)
+    started_at = time.time()
+    start = time.perf_counter()
+    try:
+        yield run
+    except BaseException:
+        run.ok = False
+        raise
+    finally:
+        _current_run.reset(token)
+        _write(
+            "INSERT INTO runs (run_id, kind, label, started_at, duration_ms, ok) VALUES (?, ?, ?, ?, ?, ?)",
+            (run.run_id, kind, label, started_at, (time.perf_counter() - start) * 1000, int(run.ok))
+        )
+
+@contextmanager
+def span(stage: str):
+    """
+    Times a pipeline stage and records it in the metrics store.
+
+    The span is attached to the enclosing pipeline_run, if any. It is marked as
+    failed if the block raises.
+
+    Example:
+        with span('transcribe.upload') as s:
+            response = client.post(...)
+            s.set(bytes=len(audio_data))
+    """
+    global _spans_since_prune
+    current = Span(stage)
+    started_at = time.time()
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException:
+        current.ok = False
+        raise
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        _write(
+            '''INSERT INTO spans (run_id, stage, started_at, duration_ms, bytes, tokens, cache_hit, ok)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+            (_current_run.get(), stage, started_at, duration_ms, current.bytes, current.tokens,
+             None if current.cache_hit is None else int(current.cache_hit), int(current.ok))
+        )
+        _spans_since_prune += 1
+        if _spans_since_prune >= 1000:
+            _spans_since_prune = 0
+            _prune()
+
+def _percentile(ordered: list, pct: float) -> float:
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+def get_recent_runs(limit: int = 20) -> list:
+    """Returns the most recent pipeline runs with their per-stage durations in milliseconds."""
+    with _lock:
+        conn = _get_connection()
+        runs = conn.execute(
+            "SELECT run_id, kind, label, started_at, duration_ms, ok FROM runs ORDER BY started_at DESC LIMIT ?",
+            (limit,)
+        ).fetchall()
+        results = []
+        for run_id, kind, label, started_at, duration_ms, ok in runs:
+            stages = {
+                stage: total for stage, total in conn.execute(
+                    "SELECT stage, SUM(duration_ms) FROM spans WHERE run_id = ? GROUP BY stage", (run_id,)
+                )
+            }
+            results.append({
+                'run_id': run_id,
+                'kind': kind,
+                'label': label,
+                'started_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(started_at)),
+                'duration_ms': duration_ms,
+                'ok': bool(ok),
+                'stages': stages
+            })
+    return results
+
+def get_stage_stats(since_seconds: float = None) -> list:
+    """
+    Returns per-stage duration percentiles and totals.
+
+    Args:
+        since_seconds (float): Only include spans from this many seconds ago. Includes
+            every stored span if None.
+
+    Returns:
+        list: One dict per stage with `stage`, `count`, `errors`, `p50`...`p99`
+            (milliseconds), `bytes`, `tokens`, `cache_hits` and `cache_misses`.
+    """
+    cutoff = 0.0 if since_seconds is None else time.time() - since_seconds
+    with _lock:
+        rows = _get_connection().execute(
+            "SELECT stage, duration_ms, bytes, tokens, cache_hit, ok FROM spans WHERE started_at >= ? ORDER BY stage",
+            (cutoff,)
+        ).fetchall()
+
+    grouped = {}
+    for stage, duration_ms, byte_count, tokens, cache_hit, ok in rows:
+        entry = grouped.setdefault(stage, {
+            'durations': [], 'errors': 0, 'bytes': 0, 'tokens': 0, 'cache_hits': 0, 'cache_misses': 0
+        })
+        entry['durations'].append(duration_ms)
+        entry['errors'] += 0 if ok else 1
+        entry['bytes'] += byte_count or 0
+        entry['tokens'] += tokens or 0
+        if cache_hit is not None:
+            entry['cache_hits' if cache_hit else 'cache_misses'] += 1
+
+    stats = []
+    for stage, entry in grouped.items():
+        durations = sorted(entry.pop('durations'))
+        stage_stats = {'stage': stage, 'count': len(durations), 'sum_ms': sum(durations)}
+        for pct in PERCENTILES:
+            stage_stats[f"p{pct}"] = _percentile(durations, pct)
+        stage_stats.update(entry)
+        stats.append(stage_stats)
+    return stats
+
+def export_prometheus() -> str:
+    """Returns every stored stage metric in the Prometheus text exposition format."""
+    stats = get_stage_stats()
+    lines = [
+        "# HELP flashlearn_stage_duration_seconds Duration of pipeline stages.",
+        "# TYPE flashlearn_stage_duration_seconds summary"
+    ]
+    for stage in stats:
+        labels = f'stage="{stage["stage"]}"'
+        for pct in PERCENTILES:
+            lines.append(f'flashlearn_stage_duration_seconds{{{labels},quantile="{pct / 100}"}} {stage[f"p{pct}"] / 1000:.6f}')
+        lines.append(f"flashlearn_stage_duration_seconds_sum{{{labels}}} {stage['sum_ms'] / 1000:.6f}")
+        lines.append(f"flashlearn_stage_duration_seconds_count{{{labels}}} {stage['count']}")
+
+    counters = [
+        ('flashlearn_stage_errors_total', 'Failed pipeline stage executions.', 'errors'),
+        ('flashlearn_stage_bytes_total', 'Bytes processed by pipeline stages.', 'bytes'),
+        ('flashlearn_stage_tokens_total', 'Estimated tokens processed by pipeline stages.', 'tokens'),
+        ('flashlearn_cache_hits_total', 'Cache hits recorded by pipeline stages.', 'cache_hits'),
+        ('flashlearn_cache_misses_total', 'Cache misses recorded by pipeline stages.', 'cache_misses'),
+    ]
+    for name, help_text, key in counters:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for stage in stats:
+            lines.append(f'{name}{{stage="{stage["stage"]}"}} {stage[key]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,169 @@
+"""
+Bulk export and import of saved notes.
+
+Two formats are supported:
+    - JSONL: one JSON object per note with NOTE_COLUMNS keys.
+    - Markdown zip: one .md file per note, with the metadata as a front matter
+      header (`key: <JSON value>` lines between `---` markers).
+
+Export streams notes from database.iter_notes, so memory use does not grow
+with the size of the library; import feeds database.import_notes, which
+commits in batches and skips notes that are already saved.
+
+Usage:
+    python notes_export.py export notes.jsonl
+    python notes_export.py export notes.zip --format markdown
+    python notes_export.py import notes.jsonl
+"""
+import argparse
+import io
+import json
+import re
+import zipfile
+
+import database
+
+EXPORT_FORMATS = ('jsonl', 'markdown')
+FRONT_MATTER_FIELDS = ('title', 'youtube_url', 'summary_level', 'created_at')
+FRONT_MATTER_MARKER = '---'
+
+_SLUG_RE = re.compile(r'[^A-Za-z0-9]+')
+
+def format_for_path(path: str) -> str:
+    """Guesses the export format from a file name: .zip is Markdown, anything else JSONL."""
+    return 'markdown' if path.lower().endswith('.zip') else 'jsonl'
+
+def export_jsonl(text_file) -> int:
+    """
+    Writes every saved note to `text_file` as JSON lines.
+
+    Returns:
+        int: The number of notes written.
+    """
+    count = 0
+    for note in database.iter_notes():
+        text_file.write(json.dumps(note, ensure_ascii=False))
+        text_file.write('\n')
+        count += 1
+    return count
+
+def _markdown_file_name(note: dict) -> str:
+    slug = _SLUG_RE.sub('-', note['title']).strip('-').lower()[:60] or 'note'
+    return f"{note['id']:06d}-{slug}.md"
+
+def _note_to_markdown(note: dict) -> str:
+    header = [FRONT_MATTER_MARKER]
+    header += [f"{field}: {json.dumps(note.get(field), ensure_ascii=False)}" for field in FRONT_MATTER_FIELDS]
+    header.append(FRONT_MATTER_MARKER)
+    return '\n'.join(header) + '\n\n' + (note.get('notes_content') or '')
+
+def export_markdown_zip(binary_file) -> int:
+    """
+    Writes every saved note to `binary_file` as a zip of Markdown files.
+
+    Returns:
+        int: The number of notes written.
+    """
+    count = 0
+    with zipfile.ZipFile(binary_file, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for note in database.iter_notes():
+            archive.writestr(_markdown_file_name(note), _note_to_markdown(note))
+            count += 1
+    return count
+
+def write_export(binary_file, export_format: str) -> int:
+    """
+    Exports every saved note to an open binary file in the given format.
+
+    Returns:
+        int: The number of notes written.
+    """
+    if export_format == 'markdown':
+        return export_markdown_zip(binary_file)
+    text_file = io.TextIOWrapper(binary_file, encoding='utf-8')
+    try:
+        return export_jsonl(text_file)
+    finally:
+        text_file.flush()
+        # Leave the caller's file open
+        text_file.detach()
+
+def export_notes(path: str, export_format: str = None) -> int:
+    """Exports every saved note to `path`, choosing the format from the extension if not given."""
+    with open(path, 'wb') as binary_file:
+        return write_export(binary_file, export_format or format_for_path(path))
+
+def read_jsonl(text_file):
+    """Yields note dicts from a JSONL export, raising ValueError on a malformed line."""
+    for line_number, line in enumerate(text_file, start=1):
+        if not line.strip():
+            continue
+        try:
+            note = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Line {line_number} is not valid JSON: {e}") from e
+        if not isinstance(note, dict):
+            raise ValueError(f"Line {line_number} is not a JSON object")
+        yield note
+
+def _markdown_to_note(text: str, name: str) -> dict:
+    lines = text.split('\n')
+    if not lines or lines[0].strip() != FRONT_MATTER_MARKER:
+        raise ValueError(f"{name} has no front matter header")
+    note = {}
+    for index, line in enumerate(lines[1:], start=1):
+        if line.strip() == FRONT_MATTER_MARKER:
+            note['notes_content'] = '\n'.join(lines[index + 1:]).lstrip('\n')
+            return note
+        field, _, value = line.partition(':')
+        try:
+            note[field.strip()] = json.loads(value)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{name} has an invalid value for '{field.strip()}'") from e
+    raise ValueError(f"{name} has an unterminated front matter header")
+
+def read_markdown_zip(binary_file):
+    """Yields note dicts from a Markdown zip export, one archive member at a time."""
+    with zipfile.ZipFile(binary_file) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or not info.filename.endswith('.md'):
+                continue
+            text = archive.read(info).decode('utf-8')
+            yield _markdown_to_note(text, info.filename)
+
+def import_notes_file(binary_file, import_format: str) -> dict:
+    """
+    Imports notes from an open binary file in the given format.
+
+    Returns:
+        dict: `imported` and `skipped` counts from database.import_notes.
+    """
+    if import_format == 'markdown':
+        return database.import_notes(read_markdown_zip(binary_file))
+    text_file = io.TextIOWrapper(binary_file, encoding='utf-8')
+    try:
+        return database.import_notes(read_jsonl(text_file))
+    finally:
+        # Leave the caller's file open
+        text_file.detach()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['export', 'import'])
+    parser.add_argument('path', help="File to write (export) or read (import)")
+    parser.add_argument('--format', choices=EXPORT_FORMATS,
+                        help="Defaults to markdown for .zip files and jsonl otherwise")
+    parser.add_argument('--db', default=database.DB_FILE, help="Notes database to use")
+    args = parser.parse_args()
+
+    database.DB_FILE = args.db
+    if args.command == 'export':
+        count = export_notes(args.path, args.format)
+        print(f"Exported {count} note(s) to {args.path}")
+    else:
+        with open(args.path, 'rb') as binary_file:
+            result = import_notes_file(binary_file, args.format or format_for_path(args.path))
+        print(f"Imported {result['imported']} note(s), skipped {result['skipped']} already saved")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+import re
+import html
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+# Session-state fields that make up a notes style, in the order used for cache keys
+STYLE_FIELDS = (
+    'title_font_size', 'notes_font_size', 'line_height', 'title_font_family',
+    'notes_font_style', 'font_weight', 'container_width', 'padding', 'margin_bottom',
+    'border_radius', 'text_alignment', 'title_alignment', 'title_color', 'notes_color',
+    'background_color', 'border_color', 'accent_color', 'shadow_intensity'
+)
+
+SHADOW_STYLES = {
+    'none': 'none',
+    'light': '0 2px 4px rgba(0,0,0,0.1)',
+    'medium': '0 4px 8px rgba(0,0,0,0.15)',
+    'strong': '0 8px 16px rgba(0,0,0,0.2)'
+}
+
+RENDER_CACHE_SIZE = 32
+
+_HEADING_RE = re.compile(r'^(#{1,6})\s+(.*)$')
+_BULLET_RE = re.compile(r'^(\s*)[-*+]\s+(.*)$')
+_NUMBERED_RE = re.compile(r'^(\s*)\d+[.)]\s+(.*)$')
+_BOLD_RE = re.compile(r'\*\*(.+?)\*\*|__(.+?)__')
+_ITALIC_RE = re.compile(r'(?<![*\w])\*(?!\s)(.+?)(?<!\s)\*(?!\*)|(?<![_\w])_(?!\s)(.+?)(?<!\s)_(?!\w)')
+_CODE_RE = re.compile(r'`([^`]+)`')
+
+_render_cache = OrderedDict()
+_markdown_cache = OrderedDict()
+_render_lock = threading.Lock()
+
+def style_from_session(session_state) -> tuple:
+    """Returns the current style configuration as a hashable tuple of STYLE_FIELDS values."""
+    return tuple(session_state[field] for field in STYLE_FIELDS)
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def compile_notes_css(style: tuple) -> str:
+    """Compiles a style tuple into the CSS block for the notes container, once per unique style."""
+    s = dict(zip(STYLE_FIELDS, style))
+    return f"""
+        <style>
+        .notes-container {{
+            width: {s['container_width']}%;
+            margin: 20px auto;
+            max-width: 1200px;
+        }}
+        .dynamic-notes-title {{
+            font-family: {s['title_font_family']};
+            font-size: {s['title_font_size']}px;
+            color: {s['title_color']};
+            font-weight: bold;
+            margin-bottom: 20px;
+            margin-top: 10px;
+            text-align: {s['title_alignment']};
+        }}
+        .dynamic-notes-content {{
+            font-family: {s['notes_font_style']};
+            font-size: {s['notes_font_size']}px;
+            color: {s['notes_color']};
+            line-height: {s['line_height']};
+            font-weight: {s['font_weight']};
+            text-align: {s['text_alignment']};
+        }}
+        .dynamic-notes-content p, .dynamic-notes-content ul, .dynamic-notes-content ol {{
+            margin-bottom: {s['margin_bottom']}px;
+        }}
+        .dynamic-notes-content h1, .dynamic-notes-content h2, .dynamic-notes-content h3,
+        .dynamic-notes-content h4, .dynamic-notes-content h5, .dynamic-notes-content h6 {{
+            color: {s['title_color']};
+        }}
+        .dynamic-notes-content mark, .dynamic-notes-content code {{
+            background-color: {s['accent_color']};
+        }}
+        .main-notes-area {{
+            background-color: {s['background_color']};
+            padding: {s['padding']}px;
+            border-radius: {s['border_radius']}px;
+            border: 1px solid {s['border_color']};
+            margin: 20px 0;
+            box-shadow: {SHADOW_STYLES.get(s['shadow_intensity'], 'none')};
+        }}
+        </style>
+    """
+
+def _render_inline(text: str) -> str:
+    """Escapes a line of text and converts inline Markdown (code, bold, italic)."""
+    text = html.escape(text, quote=False)
+    text = _CODE_RE.sub(r'<code>\1</code>', text)
+    text = _BOLD_RE.sub(lambda m: f"<strong>{m.group(1) or m.group(2)}</strong>", text)
+    text = _ITALIC_RE.sub(lambda m: f"<em>{m.group(1) or m.group(2)}</em>", text)
+    return text
+
+def markdown_to_html(markdown_text: str) -> str:
+    """
+    Converts summary Markdown to sanitized HTML.
+
+    Supports the subset Gemini produces for notes: headings, bullet and numbered
+    lists, paragraphs, bold, italic and inline code. All text is HTML-escaped
+    first, so the output contains no markup other than these tags.
+    """
+    blocks = []
+    paragraph = []
+    list_tag = None
+    list_items = []
+
+    def flush_paragraph():
+        if paragraph:
+            blocks.append(f"<p>{'<br>'.join(_render_inline(line) for line in paragraph)}</p>")
+            paragraph.clear()
+
+    def flush_list():
+        nonlocal list_tag
+        if list_tag:
+            items = ''.join(f"<li>{_render_inline(item)}</li>" for item in list_items)
+            blocks.append(f"<{list_tag}>{items}</{list_tag}>")
+            list_items.clear()
+            list_tag = None
+
+    for line in markdown_text.splitlines():
+        stripped = line.strip()
+        heading = _HEADING_RE.match(stripped)
+        bullet = _BULLET_RE.match(line)
+        numbered = _NUMBERED_RE.match(line)
+
+        if not stripped:
+            flush_paragraph()
+            flush_list()
+        elif heading:
+            flush_paragraph()
+            flush_list()
+            level = len(heading.group(1))
+            blocks.append(f"<h{level}>{_render_inline(heading.group(2))}</h{level}>")
+        elif bullet or numbered:
+            flush_paragraph()
+            tag = 'ul' if bullet else 'ol'
+            if list_tag != tag:
+                flush_list()
+                list_tag = tag
+            list_items.append((bullet or numbered).group(2))
+        elif list_tag and line.startswith((' ', '\t')):
+            list_items[-1] += f" {stripped}"
+        else:
+            flush_list()
+            paragraph.append(stripped)
+
+    flush_paragraph()
+    flush_list()
+    return '\n'.join(blocks)
+
+def render_notes_html(title: str, content: str, style: tuple) -> str:
+    """
+    Returns the full styled HTML for a set of notes.
+
+    Results are kept in a bounded LRU keyed by (content hash, title, style), so
+    reruns that change nothing, and large notes re-rendered with a style seen
+    before, do no conversion work.
+    """
+    content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+    key = (content_hash, title, style)
+    with _render_lock:
+        cached = _render_cache.get(key)
+        if cached is not None:
+            _render_cache.move_to_end(key)
+            return cached
+
+    body_html = _markdown_to_html_cached(content_hash, content)
+    notes_html = f"""{compile_notes_css(style)}
+        <div class="notes-container">
+            <div class="main-notes-area">
+                <div class="dynamic-notes-title">{html.escape(title)}</div>
+                <div class="dynamic-notes-content">
+                    {body_html}
+                </div>
+            </div>
+        </div>
+        """
+
+    with _render_lock:
+        _render_cache[key] = notes_html
+        _render_cache.move_to_end(key)
+        while len(_render_cache) > RENDER_CACHE_SIZE:
+            _render_cache.popitem(last=False)
+    return notes_html
+
+def _markdown_to_html_cached(content_hash: str, content: str) -> str:
+    """Converts Markdown once per content hash, independent of the style in use."""
+    with _render_lock:
+        cached = _markdown_cache.get(content_hash)
+        if cached is not None:
+            _markdown_cache.move_to_end(content_hash)
+            return cached
+    body_html = markdown_to_html(content)
+    with _render_lock:
+        _markdown_cache[content_hash] = body_html
+        while len(_markdown_cache) > RENDER_CACHE_SIZE:
+            _markdown_cache.popitem(last=False)
+    return body_html
@@ -0,0 +1,179 @@
+import re
+import json
+import hashlib
+
+from metrics import span
+from summarizer import estimate_tokens
+
+# How aggressively each summary level trims the transcript. Deep notes keep the
+# most, since filler phrasing can still carry nuance the summary should cover.
+PREPROCESS_LEVELS = {
+    "brief": {
+        "strip_fillers": True,
+        "strip_hedges": True,
+        "dedupe_similarity": 0.8,
+        "dedupe_window": 50,
+        "strip_boilerplate": True
+    },
+    "moderate": {
+        "strip_fillers": True,
+        "strip_hedges": False,
+        "dedupe_similarity": 0.9,
+        "dedupe_window": 30,
+        "strip_boilerplate": True
+    },
+    "deep": {
+        "strip_fillers": True,
+        "strip_hedges": False,
+        "dedupe_similarity": 1.0,
+        "dedupe_window": 10,
+        "strip_boilerplate": True
+    }
+}
+
+# Bump when the cleaning rules below change, so summaries cached from older output are not reused
+PREPROCESS_VERSION = 3
+
+# Sentences this close to the start or end are checked for channel boilerplate
+BOILERPLATE_EDGE_SENTENCES = 15
+
+_WHITESPACE_RE = re.compile(r'[ \t]+')
+_BLANK_LINES_RE = re.compile(r'\n\s*\n+')
+# Fillers and hedges are only removed where commas or a sentence boundary set them
+# apart, so words like "mm" (millimetres), "Er" (erbium) or "a kind of enzyme" survive
+_FILLERS = r'(?:um+|uh+|erm|hmm+)'
+_HEDGES = r'(?:you know|i mean|basically|actually|literally|like)'
+_FILLER_RE = re.compile(
+    rf',\s*{_FILLERS}\b(?=[,.!?])|(?:^|(?<=[.!?] )){_FILLERS}\b(?:,\s*|(?=[.!?]|$))',
+    re.IGNORECASE
+)
+_HEDGE_RE = re.compile(
+    rf',\s*{_HEDGES},(?=\s)|(?:^|(?<=[.!?] )){_HEDGES},\s*',
+    re.IGNORECASE
+)
+_ORPHAN_PUNCT_RE = re.compile(r'\s+([.,!?])|(?<=[.!?])[\s.,]*[.,]')
+# Only short function words are collapsed when repeated; longer repeats ("had had",
+# "bye bye", "very very") are usually deliberate
+_STUTTER_RE = re.compile(
+    r"\b(i|a|an|the|and|but|or|so|to|of|in|on|at|it|it's|is|we|you|he|she|they|this|if|my)(?:[\s,]+\1\b)+",
+    re.IGNORECASE
+)
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+_SPEAKER_RE = re.compile(r'^(Speaker \d+):\s*', re.MULTILINE)
+_BOILERPLATE_RE = re.compile(
+    r"\b(?:subscribe|like and share|smash (?:that|the) like|hit the (?:bell|like)|notification bell|"
+    r"welcome back to (?:my|the) channel|thanks for watching|see you (?:in the )?next (?:video|time)|"
+    r"link in the description|patreon|sponsored by|this video is sponsored)\b",
+    re.IGNORECASE
+)
+_WORD_RE = re.compile(r'\w+')
+
+def _word_shingles(sentence: str) -> frozenset:
+    words = _WORD_RE.findall(sentence.lower())
+    if len(words) < 3:
+        return frozenset(words)
+    return frozenset(zip(words, words[1:], words[2:]))
+
+def _repeated_sentences(sentences: list, similarity: float, window: int) -> set:
+    """Returns the indexes of sentences that repeat (or nearly repeat) one of the previous `window` kept sentences."""
+    repeated = set()
+    recent = []
+    for index, sentence in enumerate(sentences):
+        shingles = _word_shingles(sentence)
+        if not shingles:
+            continue
+        if any(len(shingles & previous) / len(shingles | previous) >= similarity for previous in recent):
+            repeated.add(index)
+            continue
+        recent.append(shingles)
+        if len(recent) > window:
+            recent.pop(0)
+    return repeated
+
+def _boilerplate_sentences(sentences: list) -> set:
+    """Returns the indexes of channel boilerplate (subscribe reminders, sponsor reads) near the start and end."""
+    last_index = len(sentences) - 1
+    return {
+        index for index, sentence in enumerate(sentences)
+        if (index < BOILERPLATE_EDGE_SENTENCES or last_index - index < BOILERPLATE_EDGE_SENTENCES)
+        and _BOILERPLATE_RE.search(sentence)
+    }
+
+def _split_line(line: str, settings: dict):
+    """
+    Strips fillers, hedges and stutters from one line and splits it into sentences.
+
+    Returns:
+        tuple: (prefix, sentences), where prefix keeps a leading "Speaker N: " label.
+    """
+    prefix = ''
+    match = _SPEAKER_RE.match(line)
+    if match:
+        prefix, line = f"{match.group(1)}: ", line[match.end():]
+
+    if settings['strip_fillers']:
+        line = _FILLER_RE.sub('', line)
+    if settings['strip_hedges']:
+        line = _HEDGE_RE.sub('', line)
+    line = _STUTTER_RE.sub(r'\1', line)
+    line = _ORPHAN_PUNCT_RE.sub(lambda match: match.group(1) or '', line)
+    line = _WHITESPACE_RE.sub(' ', line).strip()
+
+    sentences = [sentence for sentence in _SENTENCE_RE.split(line) if _WORD_RE.search(sentence)]
+    return prefix, [sentence[0].upper() + sentence[1:] for sentence in sentences]
+
+def preprocess_fingerprint(summary_level: str) -> str:
+    """Returns a short fingerprint of the preprocessing applied for a summary level."""
+    settings = PREPROCESS_LEVELS.get(summary_level, PREPROCESS_LEVELS["moderate"])
+    raw = json.dumps([PREPROCESS_VERSION, settings], sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+def preprocess_transcript(text: str, summary_level: str):
+    """
+    Cleans a transcript before summarization to cut prompt tokens.
+
+    Normalizes whitespace, strips filler words and stutters, and drops
+    repeated or near-duplicate sentences and intro/outro boilerplate. Sentence
+    deduplication and the boilerplate check look across the whole transcript,
+    not line by line. Line breaks and any "Speaker N:" labels already in the
+    text are kept. How much is removed depends on PREPROCESS_LEVELS[summary_level].
+
+    Args:
+        text (str): The raw transcript.
+        summary_level (str): 'brief', 'moderate', or 'deep'.
+
+    Returns:
+        tuple: (cleaned_text, stats) where stats has `tokens_before`,
+            `tokens_after` and `reduction` (fraction of tokens removed).
+    """
+    settings = PREPROCESS_LEVELS.get(summary_level, PREPROCESS_LEVELS["moderate"])
+    with span('preprocess') as preprocess_span:
+        tokens_before = estimate_tokens(text)
+
+        normalized = _BLANK_LINES_RE.sub('\n', text.replace('\r\n', '\n'))
+        lines = [_split_line(line, settings) for line in normalized.split('\n')]
+        sentences = [sentence for _, line_sentences in lines for sentence in line_sentences]
+
+        dropped = set()
+        if settings['dedupe_similarity'] < 1.0 or settings['dedupe_window']:
+            dropped |= _repeated_sentences(sentences, settings['dedupe_similarity'], settings['dedupe_window'])
+        if settings['strip_boilerplate']:
+            dropped |= _boilerplate_sentences(sentences)
+
+        cleaned_lines = []
+        index = 0
+        for prefix, line_sentences in lines:
+            kept = [sentence for offset, sentence in enumerate(line_sentences, start=index) if offset not in dropped]
+            index += len(line_sentences)
+            if kept:
+                cleaned_lines.append(prefix + ' '.join(kept))
+        cleaned = '\n'.join(cleaned_lines)
+
+        tokens_after = estimate_tokens(cleaned)
+        preprocess_span.set(tokens=tokens_before - tokens_after)
+
+    return cleaned, {
+        'tokens_before': tokens_before,
+        'tokens_after': tokens_after,
+        'reduction': 1 - tokens_after / tokens_before if tokens_before else 0.0
+    }
@@ -0,0 +1,240 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# HTTP statuses worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# Per-provider request rate limits, retry policy and circuit breaker settings
+PROVIDER_SETTINGS = {
+    'deepgram': {
+        'rate_per_second': 5.0,
+        'burst': 10,
+        'max_attempts': 5,
+        'base_delay': 1.0,
+        'max_delay': 30.0,
+        'failure_threshold': 5,
+        'reset_seconds': 30.0
+    },
+    'gemini': {
+        'rate_per_second': 2.0,
+        'burst': 5,
+        'max_attempts': 5,
+        'base_delay': 1.0,
+        'max_delay': 60.0,
+        'failure_threshold': 5,
+        'reset_seconds': 30.0
+    }
+}
+
+class CircuitOpenError(Exception):
+    """Raised when a provider's circuit breaker is open and calls are being rejected."""
+
+class RetryableError(Exception):
+    """
+    Wraps a transient provider failure.
+
+    Set `throttled` when the provider rate-limited the call, and `retry_after`
+    when it said how long to wait.
+    """
+
+    def __init__(self, message: str, retry_after: float = None, throttled: bool = False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.throttled = throttled
+
+class TokenBucket:
+    """
+    An adaptive token-bucket rate limiter.
+
+    The refill rate drops by half whenever the provider rate-limits us and
+    creeps back up towards `max_rate` after successful calls (AIMD), so
+    throughput settles just under the provider's real quota. A Retry-After
+    pause blocks every caller, not just the one that was throttled.
+    """
+
+    def __init__(self, rate: float, capacity: int, min_rate: float = None):
+        self.max_rate = rate
+        self.min_rate = min_rate or rate / 20
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available, then consumes it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Stops handing out tokens for `seconds`, e.g. to honor a Retry-After header."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def on_throttled(self):
+        """Halves the rate after the provider rate-limits a request."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+
+    def on_success(self):
+        """Slowly raises the rate back towards the configured maximum."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+class CircuitBreaker:
+    """
+    Stops calling a provider after repeated failures.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls
+    fail fast with CircuitOpenError. After `reset_seconds` one trial call is let
+    through; success closes the circuit and failure opens it again. A trial
+    that fails with a non-retryable error (a 4xx, a bad response) still shows
+    the provider is answering, so it closes the circuit too.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return 'half-open'
+        return 'open'
+
+    def before_call(self, provider: str):
+        """Raises CircuitOpenError unless a call is currently allowed."""
+        with self._lock:
+            state = self.state
+            if state == 'open' or (state == 'half-open' and self._trial_in_flight):
+                retry_in = max(self.reset_seconds - (time.monotonic() - self.opened_at), 0)
+                raise CircuitOpenError(f"{provider} is failing; not retrying for another {retry_in:.0f}s")
+            if state == 'half-open':
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def record_non_retryable(self):
+        """Records a call that failed for a non-transient reason, ending any trial in flight."""
+        with self._lock:
+            if self._trial_in_flight:
+                self.failures = 0
+                self.opened_at = None
+            self._trial_in_flight = False
+
+    def abandon_trial(self):
+        """Lets another caller make the trial call, e.g. after this one was interrupted."""
+        with self._lock:
+            self._trial_in_flight = False
+
+class Provider:
+    """Rate limiter, circuit breaker and retry settings shared by all calls to one API."""
+
+    def __init__(self, name: str, settings: dict):
+        self.name = name
+        self.settings = settings
+        self.bucket = TokenBucket(settings['rate_per_second'], settings['burst'])
+        self.breaker = CircuitBreaker(settings['failure_threshold'], settings['reset_seconds'])
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+def get_provider(name: str) -> Provider:
+    """Returns the process-wide Provider for `name`, creating it from PROVIDER_SETTINGS."""
+    with _providers_lock:
+        if name not in _providers:
+            _providers[name] = Provider(name, PROVIDER_SETTINGS[name])
+        return _providers[name]
+
+def parse_retry_after(value: str):
+    """Parses a Retry-After header (seconds or HTTP date) into seconds, or None."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Returns a full-jitter exponential backoff delay for a 1-based retry attempt."""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+
+def call_with_retries(provider_name: str, fn, *args, max_attempts: int = None, **kwargs):
+    """
+    Calls `fn(*args, **kwargs)` under the provider's rate limiter and circuit breaker.
+
+    `fn` signals a transient failure by raising RetryableError; those are retried
+    with jittered exponential backoff (or the provider's Retry-After, if longer)
+    up to `max_attempts` times. Any other exception (bad request, auth) is
+    raised immediately and does not count as a failure; if it ends a
+    half-open trial call, the circuit closes.
+
+    Raises:
+        CircuitOpenError: If the provider's circuit is open.
+        RetryableError: If every attempt failed transiently.
+    """
+    provider = get_provider(provider_name)
+    settings = provider.settings
+    max_attempts = max_attempts or settings['max_attempts']
+
+    for attempt in range(1, max_attempts + 1):
+        provider.breaker.before_call(provider_name)
+        provider.bucket.acquire()
+        try:
+            result = fn(*args, **kwargs)
+        except RetryableError as e:
+            provider.breaker.record_failure()
+            if e.throttled:
+                provider.bucket.on_throttled()
+            if e.retry_after is not None:
+                provider.bucket.pause(e.retry_after)
+            if attempt == max_attempts:
+                raise
+            delay = backoff_delay(attempt, settings['base_delay'], settings['max_delay'])
+            time.sleep(max(delay, e.retry_after or 0.0))
+            continue
+        except Exception:
+            provider.breaker.record_non_retryable()
+            raise
+        except BaseException:
+            provider.breaker.abandon_trial()
+            raise
+        provider.breaker.record_success()
+        provider.bucket.on_success()
+        return result
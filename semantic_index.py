@@ -0,0 +1,301 @@
+import math
+import os
+import re
+import struct
+import tempfile
+import threading
+import zlib
+
+import numpy as np
+
+# Number of hash buckets for the bag-of-words vectors. Only a note's non-zero
+# buckets are stored, so this bounds hash collisions rather than memory use.
+FEATURE_DIM = 2048
+INDEX_SUFFIX = '.vectors.log'
+
+# Each record is a header followed by `count` uint16 buckets and `count` float16
+# weights; a count of REMOVED_COUNT marks the note as deleted.
+RECORD_HEADER = struct.Struct('<qi')
+REMOVED_COUNT = -1
+BUCKET_DTYPE = np.dtype('<u2')
+WEIGHT_DTYPE = np.dtype('<f2')
+
+# The log is rewritten with only live rows once it holds at least this many
+# superseded records and more of them than live ones
+COMPACT_MIN_DEAD_RECORDS = 256
+
+_TOKEN_RE = re.compile(r'[a-z][a-z0-9]+')
+STOPWORDS = frozenset('''
+    a about above after again all also am an and any are as at be because been before being below between
+    both but by can could did do does doing down during each few for from further had has have having he her
+    here hers him his how i if in into is it its just me more most my no nor not now of off on once only or
+    other our ours out over own same she should so some such than that the their theirs them then there these
+    they this those through to too under until up very was we were what when where which while who whom why
+    will with would you your yours
+'''.split())
+
+def index_path_for(db_file: str) -> str:
+    """Returns the path of the vector index stored next to a notes database."""
+    return os.path.splitext(db_file)[0] + INDEX_SUFFIX
+
+def vectorize(text: str):
+    """
+    Turns text into a sparse hashed bag-of-words vector with sublinear term frequencies.
+
+    Words are hashed with CRC-32 rather than hash() so vectors are the same in
+    every process. IDF weighting is applied at query time, since document
+    frequencies change as notes are added and deleted.
+
+    Returns:
+        tuple: (buckets, weights) arrays, sorted by bucket.
+    """
+    counts = {}
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        bucket = zlib.crc32(token.encode('utf-8')) % FEATURE_DIM
+        counts[bucket] = counts.get(bucket, 0) + 1
+    buckets = np.array(sorted(counts), dtype=BUCKET_DTYPE)
+    weights = np.array([1.0 + math.log(counts[bucket]) for bucket in buckets.tolist()], dtype=WEIGHT_DTYPE)
+    return buckets, weights
+
+def _encode_record(note_id: int, row) -> bytes:
+    if row is None:
+        return RECORD_HEADER.pack(note_id, REMOVED_COUNT)
+    buckets, weights = row
+    return RECORD_HEADER.pack(note_id, len(buckets)) + buckets.tobytes() + weights.tobytes()
+
+class SemanticIndex:
+    """
+    Term-frequency vectors for saved notes, kept as an append-only log on disk.
+
+    Each note is stored sparsely as its non-zero buckets and float16 weights,
+    a few hundred bytes for a typical note. Saving or deleting a note appends
+    one record, and other processes read only the records appended since they
+    last looked. Once superseded records outnumber live ones the log is
+    rewritten with just the live rows.
+
+    Similarity search weights the rows by the current IDF, normalizes them and
+    scores every note in a few vectorized passes over the concatenated rows.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows = {}
+        self._dead_records = 0
+        self._inode = None
+        self._offset = 0
+        self._packed = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _apply_records(self, data: bytes) -> int:
+        """Applies complete records from `data` and returns how many bytes were consumed."""
+        position = 0
+        while position + RECORD_HEADER.size <= len(data):
+            note_id, count = RECORD_HEADER.unpack_from(data, position)
+            end = position + RECORD_HEADER.size + max(count, 0) * (BUCKET_DTYPE.itemsize + WEIGHT_DTYPE.itemsize)
+            if end > len(data):
+                # Another process is still writing this record
+                break
+            if note_id in self.rows:
+                self._dead_records += 1
+            if count == REMOVED_COUNT:
+                self._dead_records += 1
+                self.rows.pop(note_id, None)
+            else:
+                buckets_end = position + RECORD_HEADER.size + count * BUCKET_DTYPE.itemsize
+                # Copied so the rows do not pin the whole chunk that was read
+                buckets = np.frombuffer(data, BUCKET_DTYPE, count, position + RECORD_HEADER.size).copy()
+                weights = np.frombuffer(data, WEIGHT_DTYPE, count, buckets_end).copy()
+                self.rows[note_id] = (buckets, weights)
+            position = end
+        if position:
+            self._packed = None
+        return position
+
+    def _reload_if_changed(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            # First load, or another process compacted the log
+            if self._inode is not None:
+                self._generation += 1
+            self.rows = {}
+            self._dead_records = 0
+            self._inode = stat.st_ino
+            self._offset = 0
+            self._packed = None
+        if stat.st_size == self._offset:
+            return
+        with open(self.path, 'rb') as index_file:
+            index_file.seek(self._offset)
+            data = index_file.read(stat.st_size - self._offset)
+        self._offset += self._apply_records(data)
+
+    def _append(self, records: bytes):
+        # A single O_APPEND write keeps records from concurrent processes whole
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, records)
+        finally:
+            os.close(fd)
+        self._reload_if_changed()
+
+    def _compact_if_needed(self):
+        if self._dead_records < max(COMPACT_MIN_DEAD_RECORDS, len(self.rows)):
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(suffix=INDEX_SUFFIX, dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as index_file:
+                for note_id, row in self.rows.items():
+                    index_file.write(_encode_record(note_id, row))
+            # Readers in other processes see either the old or the new log, never a partial one.
+            # A record appended to the old log during the swap is lost; other processes see the
+            # replacement as a new generation and re-run sync_semantic_index to restore it.
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        stat = os.stat(self.path)
+        self._inode = stat.st_ino
+        self._offset = stat.st_size
+        self._dead_records = 0
+
+    def generation(self) -> int:
+        """
+        Returns how many times another process has replaced the log since this
+        instance first read it. Records appended during a replacement can be
+        lost, so callers re-sync the index when this changes.
+        """
+        with self._lock:
+            self._reload_if_changed()
+            return self._generation
+
+    def note_ids(self) -> set:
+        """Returns the IDs of every indexed note."""
+        with self._lock:
+            self._reload_if_changed()
+            return set(self.rows)
+
+    def add(self, notes: list):
+        """
+        Indexes notes, replacing any existing rows for the same IDs.
+
+        Args:
+            notes (list): (note_id, text) pairs.
+        """
+        if not notes:
+            return
+        records = b''.join(_encode_record(note_id, vectorize(text)) for note_id, text in notes)
+        with self._lock:
+            self._reload_if_changed()
+            self._append(records)
+            self._compact_if_needed()
+
+    def remove(self, note_ids: list):
+        """Drops the rows for the given note IDs."""
+        with self._lock:
+            self._reload_if_changed()
+            records = b''.join(_encode_record(note_id, None) for note_id in note_ids if note_id in self.rows)
+            if not records:
+                return
+            self._append(records)
+            self._compact_if_needed()
+
+    def _packed_rows(self):
+        """
+        Returns the rows concatenated CSR-style, IDF-weighted and L2-normalized,
+        cached until the index changes.
+
+        Returns:
+            tuple: (ids, row_starts, row_lengths, buckets, weights, idf).
+        """
+        if self._packed is None:
+            ids = np.fromiter(self.rows, dtype=np.int64, count=len(self.rows))
+            lengths = np.fromiter((len(buckets) for buckets, _ in self.rows.values()), dtype=np.int64, count=len(ids))
+            row_starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]) if len(ids) else np.empty(0, dtype=np.int64)
+            if len(ids):
+                buckets = np.concatenate([buckets for buckets, _ in self.rows.values()]).astype(np.intp)
+                weights = np.concatenate([weights for _, weights in self.rows.values()]).astype(np.float32)
+            else:
+                buckets = np.empty(0, dtype=np.intp)
+                weights = np.empty(0, dtype=np.float32)
+            doc_freq = np.bincount(buckets, minlength=FEATURE_DIM)
+            idf = (np.log((1 + len(ids)) / (1 + doc_freq)) + 1).astype(np.float32)
+            weights = weights * idf[buckets]
+            norms = np.sqrt(self._row_sums(weights * weights, lengths))
+            norms[norms == 0] = 1.0
+            weights /= np.repeat(norms, lengths)
+            self._packed = (ids, row_starts, lengths, buckets, weights, idf)
+        return self._packed
+
+    @staticmethod
+    def _row_sums(values: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        """Sums the concatenated `values` row by row; rows with no values (e.g. no ASCII words) sum to 0."""
+        row_of_value = np.repeat(np.arange(len(lengths)), lengths)
+        return np.bincount(row_of_value, weights=values, minlength=len(lengths)).astype(np.float32)
+
+    def _scores(self, query: np.ndarray) -> np.ndarray:
+        """Returns the cosine similarity of every row to a dense, normalized, IDF-weighted query."""
+        ids, row_starts, lengths, buckets, weights, _ = self._packed_rows()
+        return self._row_sums(weights * query[buckets], lengths)
+
+    def _top_k(self, scores: np.ndarray, k: int, exclude_index: int = None) -> list:
+        ids = self._packed[0]
+        if exclude_index is not None:
+            scores[exclude_index] = -1.0
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top if scores[i] > 0]
+
+    def related(self, note_id: int, k: int = 5) -> list:
+        """
+        Finds the notes most similar to an indexed note.
+
+        Returns:
+            list: (note_id, cosine_similarity) pairs, most similar first. Empty
+                if the note is not indexed.
+        """
+        with self._lock:
+            self._reload_if_changed()
+            if note_id not in self.rows:
+                return []
+            ids, row_starts, lengths, buckets, weights, _ = self._packed_rows()
+            index = int(np.flatnonzero(ids == note_id)[0])
+            row = slice(row_starts[index], row_starts[index] + lengths[index])
+            query = np.zeros(FEATURE_DIM, dtype=np.float32)
+            query[buckets[row]] = weights[row]
+            return self._top_k(self._scores(query), k, exclude_index=index)
+
+    def search(self, text: str, k: int = 5) -> list:
+        """Finds the notes most similar to free text, as (note_id, cosine_similarity) pairs."""
+        with self._lock:
+            self._reload_if_changed()
+            if not self.rows:
+                return []
+            idf = self._packed_rows()[5]
+            buckets, weights = vectorize(text)
+            query = np.zeros(FEATURE_DIM, dtype=np.float32)
+            query[buckets.astype(np.intp)] = weights.astype(np.float32) * idf[buckets.astype(np.intp)]
+            norm = np.linalg.norm(query)
+            if norm == 0:
+                return []
+            return self._top_k(self._scores(query / norm), k)
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_index(db_file: str) -> SemanticIndex:
+    """Returns the process-wide index for a notes database."""
+    path = index_path_for(db_file)
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = SemanticIndex(path)
+        return _indexes[path]
@@ -1,34 +1,342 @@
-import google.generativeai as genai
-import streamlit as st
+import re
+import hashlib
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 
-def summarize_text(text: str, summary_level: str) -> str:
+from api_clients import get_gemini_model
+from disk_cache import DiskCache
+from metrics import span
+from resilience import RETRYABLE_STATUS_CODES, RetryableError, call_with_retries
+from single_flight import SingleFlight
+
+MODEL_NAME = 'gemini-1.5-flash'
+
+PROMPTS = {
+    "brief": "Please provide a brief, concise summary of the following academic notes. Focus on the main points and key takeaways.",
+    "moderate": "Please provide a moderate length summary of the following academic notes. Include key concepts, examples, and important details.",
+    "deep": "Please provide a very detailed and deep summary of the following academic notes. Cover all major topics, sub-topics, definitions, and complex ideas. Structure it with headings and bullet points for clarity."
+}
+
+# Transcripts above this size are summarized with map-reduce instead of a single call
+MAP_REDUCE_THRESHOLD_TOKENS = 24000
+CHUNK_TOKEN_BUDGET = 8000
+SUMMARY_WORKERS = 4
+
+CHUNK_PROMPT = (
+    "The following is one section of a longer academic lecture transcript. "
+    "Write detailed notes for this section only. Keep every key concept, definition, "
+    "example and important detail, and do not add an introduction or conclusion."
+)
+
+SUMMARY_CACHE_FILE = "summary_cache.db"
+SUMMARY_CACHE_MAX_BYTES = 64 * 1024 * 1024
+SUMMARY_CACHE_TTL_SECONDS = 90 * 24 * 60 * 60
+
+summary_cache = DiskCache(
+    SUMMARY_CACHE_FILE,
+    max_bytes=SUMMARY_CACHE_MAX_BYTES,
+    ttl_seconds=SUMMARY_CACHE_TTL_SECONDS
+)
+
+# Concurrent requests for the same (transcript, level) share one Gemini call
+summary_flight = SingleFlight()
+
+_SENTENCE_BOUNDARY_RE = re.compile(r'(?<=[.!?])\s+|\n+(?=Speaker \d+:)|\n{2,}')
+
+class SummarizationError(Exception):
+    """Raised when Gemini fails to produce a summary."""
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimates the number of model tokens in a text (about 4 characters per token)."""
+    return len(text) // 4 + 1
+
+def _raise_classified(e: Exception):
+    """Re-raises a Gemini failure, as RetryableError if it is a rate limit or transient error."""
+    # google.api_core errors carry the HTTP status as an int `code`
+    status = getattr(e, 'code', None)
+    if isinstance(status, int) and status in RETRYABLE_STATUS_CODES:
+        raise RetryableError(f"Gemini returned HTTP {status}: {e}", throttled=status == 429) from e
+    if isinstance(e, (ConnectionError, TimeoutError)):
+        raise RetryableError(f"Gemini request failed: {e}") from e
+    raise e
+
+def _generate_once(model, prompt: str) -> str:
+    """Makes one Gemini call, raising RetryableError for rate limits and transient server errors."""
+    try:
+        return model.generate_content(prompt).text
+    except Exception as e:
+        _raise_classified(e)
+
+def _open_stream(model, prompt: str):
+    """
+    Starts a streamed Gemini call and waits for the first chunk.
+
+    Failures before the first chunk are classified like _generate_once, so a
+    stream is retried until output starts arriving.
+
+    Returns:
+        tuple: (first chunk or None, iterator over the remaining chunks)
+    """
+    try:
+        chunks = iter(model.generate_content(prompt, stream=True))
+        return next(chunks, None), chunks
+    except Exception as e:
+        _raise_classified(e)
+
+def generate(model, prompt: str) -> str:
+    """Calls Gemini under the shared rate limiter, retry policy and circuit breaker."""
+    return call_with_retries('gemini', _generate_once, model, prompt)
+
+def split_transcript(text: str, max_tokens: int) -> list:
+    """
+    Splits a transcript into chunks under a token budget without breaking sentences.
+
+    Chunks end on sentence or speaker-turn boundaries. A single sentence longer
+    than the budget is split on whitespace as a fallback.
+
+    Args:
+        text (str): The transcript to split.
+        max_tokens (int): Approximate token budget for each chunk.
+
+    Returns:
+        list: The transcript chunks, in order.
+    """
+    max_chars = max_tokens * 4
+    chunks = []
+    current = []
+    current_len = 0
+
+    def flush():
+        nonlocal current, current_len
+        if current:
+            chunks.append(' '.join(current))
+        current = []
+        current_len = 0
+
+    for sentence in _SENTENCE_BOUNDARY_RE.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        pieces = [sentence]
+        if len(sentence) > max_chars:
+            words = sentence.split()
+            pieces, piece = [], []
+            piece_len = 0
+            for word in words:
+                if piece and piece_len + len(word) + 1 > max_chars:
+                    pieces.append(' '.join(piece))
+                    piece, piece_len = [], 0
+                piece.append(word)
+                piece_len += len(word) + 1
+            if piece:
+                pieces.append(' '.join(piece))
+        for piece in pieces:
+            if current and current_len + len(piece) + 1 > max_chars:
+                flush()
+            current.append(piece)
+            current_len += len(piece) + 1
+    flush()
+    return chunks
+
+def prompt_version(summary_level: str) -> str:
+    """
+    Returns a short fingerprint of every prompt that can shape a summary level.
+
+    Editing an entry in PROMPTS (or the chunk prompt) changes the fingerprint,
+    which invalidates the cached summaries built from it. Briefs condensed from
+    a deep summary are keyed on the deep summary's key as well (see
+    _plan_summary), so they are invalidated by changes to the deep prompt too.
+    """
+    prompt_template = PROMPTS.get(summary_level, PROMPTS["moderate"])
+    return hashlib.sha256(f"{prompt_template}\n{CHUNK_PROMPT}".encode('utf-8')).hexdigest()[:16]
+
+def summary_cache_key(text: str, summary_level: str) -> str:
+    """
+    Builds the summary cache key from the raw transcript hash, level, model,
+    prompt version and the level's preprocessing settings.
+    """
+    from preprocess import preprocess_fingerprint
+
+    text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    return DiskCache.make_key(
+        text_hash, summary_level, MODEL_NAME, prompt_version(summary_level), preprocess_fingerprint(summary_level)
+    )
+
+def _plan_summary(text: str, summary_level: str):
+    """
+    Picks the cache key and source for a summary.
+
+    A brief summary is condensed from the cached deep summary when there is
+    one, and is then cached under a key derived from the deep summary's key.
+
+    Returns:
+        tuple: (cache_key, deep_summary), where deep_summary is the cached deep
+            summary to condense, or None to summarize the transcript itself.
+    """
+    if summary_level == "brief":
+        deep_key = summary_cache_key(text, "deep")
+        cached_deep = summary_cache.get(deep_key)
+        if cached_deep is not None:
+            return DiskCache.make_key(deep_key, "brief", MODEL_NAME, prompt_version("brief")), cached_deep
+    return summary_cache_key(text, summary_level), None
+
+def get_summary_cache_stats() -> dict:
+    """Returns hit/miss counts and size information for the summary cache."""
+    return summary_cache.stats()
+
+def _map_summaries(model, text: str, chunk_tokens: int, max_workers: int) -> str:
+    """Summarizes transcript chunks concurrently and joins the partial notes in order."""
+    chunks = split_transcript(text, chunk_tokens)
+
+    def summarize_chunk(chunk):
+        return generate(model, f"{CHUNK_PROMPT}\n\nTranscript section:\n{chunk}")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        partial_summaries = list(executor.map(summarize_chunk, chunks))
+
+    return "\n\n".join(
+        f"Part {index} of {len(partial_summaries)}:\n{summary}"
+        for index, summary in enumerate(partial_summaries, start=1)
+    )
+
+def _build_final_prompt(model, text: str, summary_level: str, chunk_tokens: int, max_workers: int,
+                        deep_summary: str = None, on_preprocessed=None) -> str:
+    """
+    Builds the prompt for the call that produces the requested summary.
+
+    A brief summary is condensed from `deep_summary` when one is given.
+    Otherwise the transcript is cleaned with preprocess_transcript for the
+    level. Texts over the map-reduce threshold are first summarized chunk by
+    chunk, and the final call reduces those partial notes.
+    """
+    from preprocess import preprocess_transcript
+
+    if deep_summary is not None:
+        source_text = deep_summary
+    else:
+        source_text, stats = preprocess_transcript(text, summary_level)
+        if on_preprocessed is not None:
+            on_preprocessed(stats)
+
+    source_tokens = estimate_tokens(source_text)
+    if source_tokens > max(MAP_REDUCE_THRESHOLD_TOKENS, chunk_tokens):
+        with span('summarize.map') as mapping:
+            source_text = _map_summaries(model, source_text, chunk_tokens, max_workers)
+            mapping.set(tokens=source_tokens)
+
+    return f"{PROMPTS[summary_level]}\n\nNotes:\n{source_text}"
+
+def summarize_text(text: str, summary_level: str, max_workers: int = None, chunk_tokens: int = None,
+                   on_preprocessed=None) -> str:
     """
     Summarizes a given text using Google Gemini.
+
+    The transcript is cleaned with preprocess_transcript before it is sent.
+    Results are cached on disk by raw transcript hash, summary level, model,
+    prompt version and preprocessing settings. Short texts are summarized in a single call. Texts larger than
+    MAP_REDUCE_THRESHOLD_TOKENS are split into chunks that are summarized
+    concurrently and then combined into the requested summary level.
+    Concurrent calls for the same transcript and level share one request.
     
     Args:
         text (str): The text to be summarized.
         summary_level (str): 'brief', 'moderate', or 'deep' to control summary length.
+        max_workers (int): Concurrent chunk requests. Defaults to SUMMARY_WORKERS.
+        chunk_tokens (int): Token budget per chunk. Defaults to CHUNK_TOKEN_BUDGET.
+        on_preprocessed (callable): Called with the preprocess_transcript stats
+            (`tokens_before`, `tokens_after`, `reduction`) when the summary is
+            not cached and the transcript has been cleaned.
 
     Returns:
         str: The summarized text.
+
+    Raises:
+        SummarizationError: If the Gemini request fails.
     """
-    
-    genai.configure(api_key=st.secrets["GEMINI_API_KEY"])
-    
-    model = genai.GenerativeModel('gemini-1.5-flash')
-    
-    prompts = {
-        "brief": "Please provide a brief, concise summary of the following academic notes. Focus on the main points and key takeaways.",
-        "moderate": "Please provide a moderate length summary of the following academic notes. Include key concepts, examples, and important details.",
-        "deep": "Please provide a very detailed and deep summary of the following academic notes. Cover all major topics, sub-topics, definitions, and complex ideas. Structure it with headings and bullet points for clarity."
-    }
-    
-    prompt_template = prompts.get(summary_level, prompts["moderate"])
-    full_prompt = f"{prompt_template}\n\nNotes:\n{text}"
+    if summary_level not in PROMPTS:
+        summary_level = "moderate"
+    cache_key, deep_summary = _plan_summary(text, summary_level)
+    with span('summarize.cache_lookup') as lookup:
+        cached_summary = summary_cache.get(cache_key)
+        lookup.set(cache_hit=cached_summary is not None, tokens=estimate_tokens(text))
+    if cached_summary is not None:
+        return cached_summary
+
+    return summary_flight.do(
+        cache_key, _generate_summary, text, summary_level, cache_key, deep_summary,
+        chunk_tokens or CHUNK_TOKEN_BUDGET, max_workers or SUMMARY_WORKERS, on_preprocessed
+    )
+
+def _generate_summary(text: str, summary_level: str, cache_key: str, deep_summary: str, chunk_tokens: int,
+                      max_workers: int, on_preprocessed) -> str:
+    """Generates and caches a summary. Runs once per in-flight cache key."""
+    # Another caller may have finished the same summary after our cache lookup
+    cached_summary = summary_cache.get(cache_key)
+    if cached_summary is not None:
+        return cached_summary
+
+    try:
+        model = get_gemini_model(MODEL_NAME)
+        full_prompt = _build_final_prompt(
+            model, text, summary_level, chunk_tokens, max_workers, deep_summary, on_preprocessed
+        )
+        with span('summarize.generate') as generation:
+            summary = generate(model, full_prompt)
+            generation.set(tokens=estimate_tokens(full_prompt))
+
+        summary_cache.put(cache_key, summary)
+        return summary
+    except Exception as e:
+        raise SummarizationError(f"Error during summarization: {e}") from e
+
+def summarize_text_stream(text: str, summary_level: str, max_workers: int = None, chunk_tokens: int = None,
+                          on_preprocessed=None):
+    """
+    Summarizes a text like summarize_text, yielding the output as Gemini produces it.
+
+    A cached summary is yielded as a single chunk. Otherwise the response is
+    streamed, and the assembled text is cached once the stream completes.
+    Concatenating the yielded chunks gives the full summary.
+
+    Args:
+        text (str): The text to be summarized.
+        summary_level (str): 'brief', 'moderate', or 'deep' to control summary length.
+        max_workers (int): Concurrent chunk requests for long texts. Defaults to SUMMARY_WORKERS.
+        chunk_tokens (int): Token budget per chunk. Defaults to CHUNK_TOKEN_BUDGET.
+        on_preprocessed (callable): As for summarize_text.
+
+    Yields:
+        str: Consecutive pieces of the summary.
 
+    Raises:
+        SummarizationError: If the Gemini request fails.
+    """
+    if summary_level not in PROMPTS:
+        summary_level = "moderate"
+    cache_key, deep_summary = _plan_summary(text, summary_level)
+    with span('summarize.cache_lookup') as lookup:
+        cached_summary = summary_cache.get(cache_key)
+        lookup.set(cache_hit=cached_summary is not None, tokens=estimate_tokens(text))
+    if cached_summary is not None:
+        yield cached_summary
+        return
+
+    parts = []
     try:
-        response = model.generate_content(full_prompt)
-        return response.text
+        model = get_gemini_model(MODEL_NAME)
+        full_prompt = _build_final_prompt(
+            model, text, summary_level, chunk_tokens or CHUNK_TOKEN_BUDGET, max_workers or SUMMARY_WORKERS,
+            deep_summary, on_preprocessed
+        )
+        with span('summarize.stream_first_chunk') as first_chunk_span:
+            first_chunk, chunks = call_with_retries('gemini', _open_stream, model, full_prompt)
+            first_chunk_span.set(tokens=estimate_tokens(full_prompt))
+        for chunk in itertools.chain([first_chunk] if first_chunk is not None else [], chunks):
+            piece = chunk.text
+            if piece:
+                parts.append(piece)
+                yield piece
     except Exception as e:
-        st.error(f"Error during summarization: {e}")
-        return None
\ No newline at end of file
+        raise SummarizationError(f"Error during summarization: {e}") from e
+
+    summary_cache.put(cache_key, ''.join(parts))
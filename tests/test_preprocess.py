@@ -0,0 +1,37 @@
+import pytest
+
+import metrics
+from preprocess import preprocess_transcript
+
+@pytest.fixture(autouse=True)
+def scratch_metrics_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_DB_FILE', str(tmp_path / 'metrics.db'))
+
+@pytest.mark.parametrize('level', ['brief', 'moderate', 'deep'])
+def test_keeps_units_and_symbols_that_look_like_fillers(level):
+    text = "The wire is 2 mm thick. Er is the symbol for erbium. Ah is not a filler here either."
+    cleaned, _ = preprocess_transcript(text, level)
+    assert cleaned == text
+
+@pytest.mark.parametrize('level', ['brief', 'moderate', 'deep'])
+def test_strips_delimited_fillers(level):
+    cleaned, _ = preprocess_transcript("Um, entropy grows. So, uh, the heat flows, um. Uh, next topic.", level)
+    assert cleaned == "Entropy grows. So, the heat flows. Next topic."
+
+def test_brief_keeps_hedge_words_that_carry_meaning():
+    text = "A kind of enzyme speeds it up. What I mean is simple. It is sort of round."
+    cleaned, _ = preprocess_transcript(text, 'brief')
+    assert cleaned == text
+
+def test_brief_strips_comma_delimited_hedges():
+    cleaned, _ = preprocess_transcript("It is, you know, hard. Basically, cells divide.", 'brief')
+    assert cleaned == "It is hard. Cells divide."
+
+def test_stutters_collapse_only_short_function_words():
+    cleaned, _ = preprocess_transcript("So so we we had had enough of the the noise.", 'deep')
+    assert cleaned == "So we had had enough of the noise."
+
+def test_dedupe_and_boilerplate_span_lines():
+    text = "Please subscribe to the channel.\nEntropy is a measure of disorder.\nEntropy is a measure of disorder."
+    cleaned, _ = preprocess_transcript(text, 'moderate')
+    assert cleaned == "Entropy is a measure of disorder."
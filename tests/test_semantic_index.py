@@ -0,0 +1,42 @@
+import pytest
+
+from semantic_index import SemanticIndex
+
+@pytest.fixture
+def index(tmp_path):
+    return SemanticIndex(str(tmp_path / 'notes.vectors.log'))
+
+def test_empty_last_row_keeps_rows_normalized(index):
+    text = "heat engines carnot cycle entropy thermodynamics"
+    index.add([(1, "entropy heat thermodynamics second law"), (2, text)])
+    # No ASCII words, so this note's row has no buckets at all
+    index.add([(3, "熱力学の講義")])
+
+    matches = dict(index.search(text))
+    assert matches[2] == pytest.approx(1.0, rel=1e-3)
+    assert index.related(3) == []
+
+def test_search_scores_are_cosines(index):
+    index.add([(1, "photosynthesis chlorophyll light"), (2, "熱力学"), (3, "mitochondria respiration")])
+    matches = index.search("photosynthesis chlorophyll light")
+    assert matches[0][0] == 1
+    assert matches[0][1] == pytest.approx(1.0, rel=1e-3)
+
+def test_other_instances_read_appended_and_removed_rows(index):
+    index.add([(1, "enzyme kinetics"), (2, "enzyme inhibition")])
+    reader = SemanticIndex(index.path)
+    assert reader.note_ids() == {1, 2}
+
+    index.remove([1])
+    assert reader.note_ids() == {2}
+
+def test_generation_changes_when_another_instance_compacts(index, monkeypatch):
+    monkeypatch.setattr('semantic_index.COMPACT_MIN_DEAD_RECORDS', 1)
+    index.add([(1, "enzyme kinetics"), (2, "enzyme inhibition")])
+    assert index.generation() == 0
+
+    writer = SemanticIndex(index.path)
+    writer.add([(1, "enzyme kinetics revised"), (2, "enzyme inhibition revised")])
+    writer.add([(1, "enzyme kinetics again")])
+    assert index.generation() == 1
+    assert writer.generation() == 0
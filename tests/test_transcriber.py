@@ -0,0 +1,46 @@
+import httpx
+import pytest
+
+import resilience
+import transcriber
+from resilience import RetryableError, call_with_retries
+from transcriber import TranscriptionError, _post_to_deepgram
+
+@pytest.fixture(autouse=True)
+def fresh_providers(monkeypatch):
+    monkeypatch.setattr(resilience, '_providers', {})
+    monkeypatch.setattr(resilience, 'backoff_delay', lambda *args: 0.0)
+
+@pytest.fixture
+def timing_out_client():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    with httpx.Client(transport=httpx.MockTransport(handler)) as client:
+        client.requests = requests
+        yield client
+
+def test_full_upload_read_timeout_is_not_retried(timing_out_client):
+    with pytest.raises(TranscriptionError):
+        call_with_retries('deepgram', _post_to_deepgram, timing_out_client, {}, b'audio', retry_read_timeout=False)
+    assert len(timing_out_client.requests) == 1
+    assert resilience.get_provider('deepgram').breaker.failures == 0
+
+def test_segment_read_timeout_is_retried(timing_out_client):
+    with pytest.raises(RetryableError):
+        call_with_retries('deepgram', _post_to_deepgram, timing_out_client, {}, b'audio', max_attempts=3)
+    assert len(timing_out_client.requests) == 3
+
+@pytest.mark.parametrize('duration, expected', [(60.0, False), (transcriber.SEGMENTED_MIN_SECONDS, True)])
+def test_auto_segments_long_audio(monkeypatch, duration, expected):
+    monkeypatch.setattr(transcriber, '_probe_duration', lambda path: duration)
+    assert transcriber._should_segment('audio.mp4') is expected
+
+def test_auto_falls_back_to_one_request_without_ffprobe(monkeypatch):
+    def missing_ffprobe(path):
+        raise FileNotFoundError('ffprobe')
+    monkeypatch.setattr(transcriber, '_probe_duration', missing_ffprobe)
+    assert transcriber._should_segment('audio.mp4') is False
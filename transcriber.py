@@ -1,58 +1,532 @@
 import os
+import sys
+import queue
+import subprocess
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import yt_dlp
 import httpx
-import streamlit as st
 
-@st.cache_data(show_spinner="Downloading and transcribing audio...")
-def transcribe_youtube_video(youtube_url: str):
+from api_clients import get_http_client, get_secret
+from database import TRANSCRIPT_RETENTION_SECONDS, save_word_timings
+from disk_cache import DiskCache
+from metrics import span
+from resilience import RETRYABLE_STATUS_CODES, RetryableError, call_with_retries, parse_retry_after
+from single_flight import SingleFlight
+from word_timings import build_word_timings
+from youtube_utils import canonical_video_url, extract_video_id
+
+DEEPGRAM_URL = "https://api.deepgram.com/v1/listen"
+DEEPGRAM_PARAMS = {
+    "model": "nova-2",
+    "smart_format": "true",
+    "punctuate": "true",
+    "diarize": "true"
+}
+
+# Streaming mode: peak audio memory is bounded by STREAM_CHUNK_SIZE * STREAM_BUFFER_CHUNKS
+STREAM_CHUNK_SIZE = 256 * 1024
+STREAM_BUFFER_CHUNKS = 16
+
+# Segmented mode: long audio is cut into overlapping segments transcribed in parallel
+SEGMENT_SECONDS = 600
+SEGMENT_OVERLAP_SECONDS = 5
+SEGMENT_WORKERS = 4
+SEGMENT_MAX_ATTEMPTS = 5
+SEGMENT_TIMEOUT = 120.0
+# With segmented=None, audio at least this long is transcribed in segments. A single
+# request for a multi-hour file can outlast the HTTP read timeout.
+SEGMENTED_MIN_SECONDS = 30 * 60
+# CLI names for the segmented argument of transcribe_youtube_video
+SEGMENTED_MODES = {'auto': None, 'always': True, 'never': False}
+# A silence at least this long starts a new paragraph in a stitched transcript
+PARAGRAPH_PAUSE_SECONDS = 2.0
+
+TRANSCRIPT_CACHE_FILE = "transcript_cache.db"
+TRANSCRIPT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# notes.db keeps word timings of videos without notes for the same time
+TRANSCRIPT_CACHE_TTL_SECONDS = TRANSCRIPT_RETENTION_SECONDS
+
+transcript_cache = DiskCache(
+    TRANSCRIPT_CACHE_FILE,
+    max_bytes=TRANSCRIPT_CACHE_MAX_BYTES,
+    ttl_seconds=TRANSCRIPT_CACHE_TTL_SECONDS
+)
+
+# Concurrent requests for the same video share one download and Deepgram call
+transcribe_flight = SingleFlight()
+
+class TranscriptionError(Exception):
+    """Raised when a video cannot be downloaded or transcribed."""
+
+def get_transcript_cache_stats() -> dict:
+    """Returns hit/miss counts and size information for the transcript cache."""
+    return transcript_cache.stats()
+
+def _stream_audio_chunks(youtube_url: str, chunk_size: int = None, max_buffered_chunks: int = None):
+    """
+    Yields the audio of a YouTube video in fixed-size chunks as yt-dlp downloads it.
+
+    yt-dlp writes to stdout in a subprocess and a reader thread feeds a bounded
+    queue, so the download runs ahead of the consumer by at most
+    `max_buffered_chunks` chunks and memory use does not grow with video length.
+
+    Args:
+        youtube_url (str): The URL of the YouTube video.
+        chunk_size (int): Size in bytes of each chunk. Defaults to STREAM_CHUNK_SIZE.
+        max_buffered_chunks (int): Number of chunks buffered ahead of the consumer.
+            Defaults to STREAM_BUFFER_CHUNKS.
+
+    Yields:
+        bytes: Consecutive chunks of the audio stream.
+    """
+    chunk_size = chunk_size or STREAM_CHUNK_SIZE
+    max_buffered_chunks = max_buffered_chunks or STREAM_BUFFER_CHUNKS
+
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'yt_dlp', '--format', 'm4a/bestaudio/best',
+         '--no-playlist', '--quiet', '--output', '-', youtube_url],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    buffer = queue.Queue(maxsize=max_buffered_chunks)
+    stop_event = threading.Event()
+
+    def reader():
+        while not stop_event.is_set():
+            try:
+                chunk = process.stdout.read(chunk_size)
+            except (OSError, ValueError):
+                chunk = b''
+            while not stop_event.is_set():
+                try:
+                    buffer.put(chunk, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+            if not chunk:
+                return
+
+    reader_thread = threading.Thread(target=reader, daemon=True)
+    reader_thread.start()
+
+    try:
+        while True:
+            chunk = buffer.get()
+            if not chunk:
+                break
+            yield chunk
+
+        return_code = process.wait()
+        if return_code != 0:
+            error_output = process.stderr.read().decode('utf-8', errors='replace').strip()
+            raise RuntimeError(f"yt-dlp exited with status {return_code}: {error_output}")
+    finally:
+        stop_event.set()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        reader_thread.join(timeout=1.0)
+        process.stdout.close()
+        process.stderr.close()
+
+def _download_audio(youtube_url: str, temp_dir: str) -> str:
+    """Downloads the audio track of a YouTube video into `temp_dir` and returns its path."""
+    temp_file_path = os.path.join(temp_dir, 'audio.mp4')
+    
+    
+    ydl_opts = {
+        'format': 'm4a/bestaudio/best',
+        'outtmpl': temp_file_path,
+        'noplaylist': True,
+        'verbose': False
+    }
+    
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        ydl.download([youtube_url])
+
+    return temp_file_path
+
+def _probe_duration(audio_path: str) -> float:
+    """Returns the duration of an audio file in seconds using ffprobe."""
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+         '-of', 'default=noprint_wrappers=1:nokey=1', audio_path],
+        capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip())
+
+def _plan_segments(duration: float, segment_seconds: float, overlap_seconds: float) -> list:
+    """
+    Splits `duration` seconds into consecutive segments that overlap their neighbours.
+
+    Returns:
+        list: (start, length, keep_from, keep_until) tuples, where the keep window
+            is the segment's own time range; words heard in the overlap are kept
+            only by the segment that owns that range.
+    """
+    segments = []
+    start = 0.0
+    while start < duration:
+        nominal_end = min(start + segment_seconds, duration)
+        cut_start = max(start - overlap_seconds, 0.0)
+        cut_end = min(nominal_end + overlap_seconds, duration)
+        keep_until = nominal_end if nominal_end < duration else float('inf')
+        segments.append((cut_start, cut_end - cut_start, start, keep_until))
+        start = nominal_end
+    return segments
+
+def _cut_segment(audio_path: str, output_path: str, start: float, length: float):
+    """Extracts `length` seconds of audio starting at `start` into `output_path`."""
+    subprocess.run(
+        ['ffmpeg', '-v', 'error', '-y', '-ss', f"{start:.3f}", '-t', f"{length:.3f}",
+         '-i', audio_path, '-vn', '-c', 'copy', output_path],
+        check=True
+    )
+
+def _post_to_deepgram(client, headers: dict, content, timeout=httpx.USE_CLIENT_DEFAULT,
+                      retry_read_timeout: bool = True):
+    """
+    Sends audio to Deepgram and returns the successful response.
+
+    Connection failures, 429s and 5xx responses are raised as RetryableError
+    (with the server's Retry-After, if any) so call_with_retries can back off
+    and resend the same, already-downloaded audio.
+
+    With `retry_read_timeout` False, a read timeout is raised as a
+    TranscriptionError instead: Deepgram was still working on the whole file,
+    so resending it would only time out again, and it does not count against
+    the circuit breaker.
+    """
+    try:
+        response = client.post(DEEPGRAM_URL, params=DEEPGRAM_PARAMS, headers=headers, content=content, timeout=timeout)
+    except httpx.ReadTimeout as e:
+        if not retry_read_timeout:
+            raise TranscriptionError(
+                f"Deepgram did not respond in time ({e}); use segmented mode for long videos"
+            ) from e
+        raise RetryableError(f"Deepgram request failed: {e}") from e
+    except httpx.TransportError as e:
+        raise RetryableError(f"Deepgram request failed: {e}") from e
+    if response.status_code in RETRYABLE_STATUS_CODES:
+        raise RetryableError(
+            f"Deepgram returned HTTP {response.status_code}",
+            retry_after=parse_retry_after(response.headers.get('Retry-After')),
+            throttled=response.status_code == 429
+        )
+    response.raise_for_status()
+    return response
+
+def _transcribe_segment(client, headers: dict, segment_path: str, max_attempts: int) -> list:
+    """Transcribes one segment file, retrying it on its own, and returns its Deepgram word list."""
+    with open(segment_path, "rb") as segment_file:
+        segment_data = segment_file.read()
+    response = call_with_retries(
+        'deepgram', _post_to_deepgram, client, headers, segment_data, SEGMENT_TIMEOUT,
+        max_attempts=max_attempts
+    )
+    return response.json()['results']['channels'][0]['alternatives'][0].get('words', [])
+
+def _stitch_segments(segments: list, segment_words: list):
+    """
+    Joins per-segment word lists into one transcript in time order.
+
+    Word timestamps are shifted by each segment's start offset, and only the
+    words inside a segment's keep window are used, so speech in the overlap
+    between two segments appears exactly once.
+
+    The transcript is broken into paragraphs (one per line) at pauses of at
+    least PARAGRAPH_PAUSE_SECONDS and wherever the speaker changes within a
+    segment. Deepgram numbers speakers separately for each request, so speaker
+    0 in one segment is not necessarily speaker 0 in the next. Speaker changes
+    are therefore not detected across segment boundaries, and the speaker
+    numbers stored in the WordTimings are only comparable within one segment.
+
+    Returns:
+        tuple: (transcript, WordTimings) with timestamps relative to the whole video.
+    """
+    words = []
+    parts = []
+    previous = None
+    for segment_index, ((cut_start, _, keep_from, keep_until), seg_words) in enumerate(zip(segments, segment_words)):
+        for word in seg_words:
+            absolute_start = cut_start + word.get('start', 0.0)
+            if not keep_from <= absolute_start < keep_until:
+                continue
+            word = {
+                **word,
+                'start': absolute_start,
+                'end': cut_start + word.get('end', word.get('start', 0.0))
+            }
+            text = word.get('punctuated_word') or word.get('word')
+            if not text:
+                continue
+            if previous is not None:
+                previous_segment, previous_word = previous
+                new_paragraph = word['start'] - previous_word['end'] >= PARAGRAPH_PAUSE_SECONDS or (
+                    previous_segment == segment_index and previous_word.get('speaker') != word.get('speaker')
+                )
+                parts.append('\n' if new_paragraph else ' ')
+            parts.append(text)
+            words.append(word)
+            previous = (segment_index, word)
+    return build_word_timings(words, ''.join(parts))
+
+def transcribe_audio_segmented(audio_path: str, headers: dict, segment_seconds: float = None,
+                               overlap_seconds: float = None, max_workers: int = None):
+    """
+    Transcribes a long audio file as overlapping time segments in parallel.
+
+    Segments are sent to Deepgram through a bounded worker pool and each one is
+    retried on its own, so a transient failure does not fail the whole video.
+
+    Args:
+        audio_path (str): Path to the downloaded audio file.
+        headers (dict): Deepgram request headers.
+        segment_seconds (float): Nominal segment length. Defaults to SEGMENT_SECONDS.
+        overlap_seconds (float): Overlap between neighbouring segments.
+            Defaults to SEGMENT_OVERLAP_SECONDS.
+        max_workers (int): Number of concurrent uploads. Defaults to SEGMENT_WORKERS.
+
+    Returns:
+        tuple: (transcript, WordTimings) for the stitched transcript.
+    """
+    segment_seconds = segment_seconds or SEGMENT_SECONDS
+    overlap_seconds = SEGMENT_OVERLAP_SECONDS if overlap_seconds is None else overlap_seconds
+    max_workers = max_workers or SEGMENT_WORKERS
+
+    segments = _plan_segments(_probe_duration(audio_path), segment_seconds, overlap_seconds)
+    segment_dir = os.path.dirname(audio_path)
+    segment_paths = []
+    for index, (cut_start, length, _, _) in enumerate(segments):
+        segment_path = os.path.join(segment_dir, f"segment_{index:04d}.mp4")
+        _cut_segment(audio_path, segment_path, cut_start, length)
+        segment_paths.append(segment_path)
+
+    client = get_http_client()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        segment_words = list(executor.map(
+            lambda path: _transcribe_segment(client, headers, path, SEGMENT_MAX_ATTEMPTS),
+            segment_paths
+        ))
+
+    return _stitch_segments(segments, segment_words)
+
+def _transcript_cache_key(video_id: str):
+    return DiskCache.make_key(video_id, **DEEPGRAM_PARAMS) if video_id else None
+
+def _deepgram_headers() -> dict:
+    return {
+        "Authorization": f"Token {get_secret('DEEPGRAM_API_KEY')}",
+        "Content-Type": "audio/mp4"
+    }
+
+def _parse_response(response):
+    """Extracts the transcript and word timings from a Deepgram response."""
+    with span('transcribe.parse_response') as parse:
+        alternative = response.json()['results']['channels'][0]['alternatives'][0]
+        # Only the typed word arrays outlive this block, not the parsed response
+        transcript, timings = build_word_timings(alternative.get('words', []), alternative['transcript'])
+        parse.set(bytes=len(response.content))
+    return transcript, timings
+
+def _store_transcript(video_id: str, transcript: str, timings):
+    if video_id:
+        save_word_timings(video_id, transcript, timings)
+        transcript_cache.put(_transcript_cache_key(video_id), transcript)
+
+def _should_segment(audio_path: str) -> bool:
+    """Returns True if the audio is at least SEGMENTED_MIN_SECONDS long; False if ffprobe cannot tell."""
+    try:
+        return _probe_duration(audio_path) >= SEGMENTED_MIN_SECONDS
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        return False
+
+def _transcribe_file(audio_path: str, headers: dict, segmented: bool):
+    """
+    Uploads a downloaded audio file to Deepgram and returns (transcript, timings).
+
+    `segmented` None picks segmented mode from the audio duration.
+    """
+    if segmented is None:
+        segmented = _should_segment(audio_path)
+    if segmented:
+        with span('transcribe.segmented_upload') as upload:
+            result = transcribe_audio_segmented(audio_path, headers)
+            upload.set(bytes=os.path.getsize(audio_path))
+        return result
+
+    with span('transcribe.read_file') as read_file:
+        with open(audio_path, "rb") as audio_file:
+            audio_data = audio_file.read()
+        read_file.set(bytes=len(audio_data))
+
+    # Retries resend the audio already in memory instead of downloading again
+    with span('transcribe.upload') as upload:
+        response = call_with_retries(
+            'deepgram', _post_to_deepgram, get_http_client(), headers, audio_data,
+            retry_read_timeout=False
+        )
+        upload.set(bytes=len(audio_data))
+    return _parse_response(response)
+
+def get_cached_transcript(youtube_url: str):
+    """Returns the cached transcript for a video, or None if it has not been transcribed."""
+    video_id = extract_video_id(youtube_url)
+    if not video_id:
+        return None
+    with span('transcribe.cache_lookup') as lookup:
+        cached_transcript = transcript_cache.get(_transcript_cache_key(video_id))
+        lookup.set(cache_hit=cached_transcript is not None)
+    return cached_transcript
+
+def download_audio(youtube_url: str, temp_dir: str) -> str:
+    """
+    Downloads the audio track of a YouTube video into `temp_dir`.
+
+    Returns:
+        str: The path of the downloaded audio file.
+
+    Raises:
+        TranscriptionError: If the download fails.
+    """
+    try:
+        with span('transcribe.download') as download:
+            audio_path = _download_audio(youtube_url, temp_dir)
+            download.set(bytes=os.path.getsize(audio_path))
+        return audio_path
+    except Exception as e:
+        raise TranscriptionError(f"Error downloading audio: {e}") from e
+
+def transcribe_audio_file(audio_path: str, youtube_url: str, segmented: bool = None) -> str:
+    """
+    Transcribes an audio file already downloaded with download_audio.
+
+    The transcript and word timings are cached and stored the same way as by
+    transcribe_youtube_video, so later requests for the video reuse them.
+
+    Args:
+        audio_path (str): Path of the downloaded audio.
+        youtube_url (str): The URL of the video the audio came from.
+        segmented (bool): If True, transcribe overlapping segments in parallel; if
+            False, send the file in one request. None (the default) segments audio
+            at least SEGMENTED_MIN_SECONDS long.
+
+    Returns:
+        str: The full transcribed text.
+
+    Raises:
+        TranscriptionError: If the transcription fails.
+    """
+    try:
+        transcript, timings = _transcribe_file(audio_path, _deepgram_headers(), segmented)
+        _store_transcript(extract_video_id(youtube_url), transcript, timings)
+        return transcript
+    except TranscriptionError:
+        raise
+    except Exception as e:
+        raise TranscriptionError(f"Error during transcription: {e}") from e
+
+def list_playlist_videos(playlist_url: str) -> list:
+    """
+    Lists the videos in a YouTube playlist without downloading them.
+
+    Returns:
+        list: (video_url, title) pairs in playlist order.
+
+    Raises:
+        TranscriptionError: If the playlist cannot be read.
+    """
+    ydl_opts = {
+        'extract_flat': 'in_playlist',
+        'quiet': True,
+        'verbose': False
+    }
+    try:
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(playlist_url, download=False)
+    except Exception as e:
+        raise TranscriptionError(f"Error reading playlist: {e}") from e
+
+    videos = []
+    for entry in info.get('entries') or []:
+        video_id = extract_video_id(entry.get('url') or entry.get('id') or '')
+        if video_id:
+            videos.append((canonical_video_url(video_id), entry.get('title')))
+    return videos
+
+def transcribe_youtube_video(youtube_url: str, stream_audio: bool = False, segmented: bool = None,
+                             stream_chunk_size: int = None, stream_buffer_chunks: int = None):
     """
     Downloads the audio from a YouTube video and transcribes it using the Deepgram API directly.
+
+    Transcripts are cached on disk by canonical video ID and transcription
+    parameters, so repeated requests for the same lecture skip both the
+    download and the Deepgram call. Concurrent requests for the same video
+    wait for a single in-flight transcription and share its result.
+
+    Per-word timestamps and speakers are stored in notes.db by video ID (see
+    database.save_word_timings) so saved notes can link into the video.
     
     Args:
         youtube_url (str): The URL of the YouTube video.
+        stream_audio (bool): If True, pipe the download straight into the Deepgram
+            upload through a bounded buffer instead of staging it in a temp file.
+        segmented (bool): If True, split the audio into overlapping segments and
+            transcribe them in parallel; if False, send it in one request. None (the
+            default) segments audio at least SEGMENTED_MIN_SECONDS long. Streaming
+            is only used when segmented is not True.
+        stream_chunk_size (int): Bytes per streamed chunk. Defaults to STREAM_CHUNK_SIZE.
+        stream_buffer_chunks (int): Chunks buffered ahead of the upload when
+            streaming. Defaults to STREAM_BUFFER_CHUNKS.
 
     Returns:
         str: The full transcribed text.
+
+    Raises:
+        TranscriptionError: If the download or transcription fails.
     """
+    cached_transcript = get_cached_transcript(youtube_url)
+    if cached_transcript is not None:
+        return cached_transcript
+
+    video_id = extract_video_id(youtube_url)
+    return transcribe_flight.do(
+        video_id or youtube_url, _transcribe_uncached, youtube_url, video_id, stream_audio, segmented,
+        stream_chunk_size, stream_buffer_chunks
+    )
+
+def _transcribe_uncached(youtube_url: str, video_id: str, stream_audio: bool, segmented: bool,
+                         stream_chunk_size: int, stream_buffer_chunks: int) -> str:
+    """Downloads and transcribes a video, then caches the transcript. Runs once per in-flight video."""
+    if video_id:
+        # Another caller may have finished this video after our cache lookup
+        cached_transcript = transcript_cache.get(_transcript_cache_key(video_id))
+        if cached_transcript is not None:
+            return cached_transcript
+
     try:
-       
-        with tempfile.TemporaryDirectory() as temp_dir:
-            temp_file_path = os.path.join(temp_dir, 'audio.mp4')
-            
-            
-            ydl_opts = {
-                'format': 'm4a/bestaudio/best',
-                'outtmpl': temp_file_path,
-                'noplaylist': True,
-                'verbose': False
-            }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([youtube_url])
-            
-            
-            with open(temp_file_path, "rb") as audio_file:
-                audio_data = audio_file.read()
-
-            
-            url = "https://api.deepgram.com/v1/listen?model=nova-2&smart_format=true&punctuate=true&diarize=true"
-            headers = {
-                "Authorization": f"Token {st.secrets['DEEPGRAM_API_KEY']}",
-                "Content-Type": "audio/mp4"
-            }
-            
-            
-            with httpx.Client(timeout=60.0) as client:
-                response = client.post(url, headers=headers, content=audio_data)
-                response.raise_for_status()  
-
-            response_json = response.json()
-            
-            transcript = response_json['results']['channels'][0]['alternatives'][0]['transcript']
-            
-            return transcript
+        headers = _deepgram_headers()
+        if stream_audio and segmented is not True:
+            # Download and upload overlap, so they are timed as one stage. A
+            # streamed body cannot be replayed, so it gets a single attempt.
+            with span('transcribe.stream_upload'):
+                response = call_with_retries(
+                    'deepgram', _post_to_deepgram, get_http_client(), headers,
+                    _stream_audio_chunks(youtube_url, stream_chunk_size, stream_buffer_chunks),
+                    retry_read_timeout=False, max_attempts=1
+                )
+            transcript, timings = _parse_response(response)
+        else:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                audio_path = download_audio(youtube_url, temp_dir)
+                transcript, timings = _transcribe_file(audio_path, headers, segmented)
+
+        _store_transcript(video_id, transcript, timings)
+        return transcript
 
+    except TranscriptionError:
+        raise
     except Exception as e:
-        st.error(f"Error during transcription: {e}")
-        return None
\ No newline at end of file
+        raise TranscriptionError(f"Error during transcription: {e}") from e
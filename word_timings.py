@@ -0,0 +1,163 @@
+import re
+import zlib
+from array import array
+from bisect import bisect_right
+
+# Fuzzy passage matching looks for the window of this many transcript words
+# that contains the most distinct terms from the passage
+MATCH_WINDOW_WORDS = 60
+MATCH_MIN_TERM_LENGTH = 4
+
+NO_SPEAKER = -1
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+_SPACE_RE = re.compile(r'\s+')
+
+class WordTimings:
+    """
+    Per-word timing data for one transcript, kept in typed arrays.
+
+    `starts` and `ends` are seconds from the start of the video, `speakers` is
+    the diarized speaker number (NO_SPEAKER if unknown) and `offsets` is the
+    character offset of each word in the transcript text. That is 14 bytes per
+    word before compression, so a one-hour lecture (~9,000 words) needs about
+    125 KB rather than the megabytes its parsed Deepgram JSON occupies.
+    """
+
+    __slots__ = ('starts', 'ends', 'speakers', 'offsets')
+
+    def __init__(self, starts=None, ends=None, speakers=None, offsets=None):
+        self.starts = starts if starts is not None else array('f')
+        self.ends = ends if ends is not None else array('f')
+        self.speakers = speakers if speakers is not None else array('h')
+        self.offsets = offsets if offsets is not None else array('I')
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def to_blobs(self) -> tuple:
+        """Returns (starts, ends, speakers, offsets) as zlib-compressed bytes for storage."""
+        return tuple(zlib.compress(values.tobytes()) for values in (self.starts, self.ends, self.speakers, self.offsets))
+
+    @classmethod
+    def from_blobs(cls, starts: bytes, ends: bytes, speakers: bytes, offsets: bytes):
+        """Rebuilds WordTimings from the output of to_blobs."""
+        timings = cls()
+        for values, blob in zip((timings.starts, timings.ends, timings.speakers, timings.offsets),
+                                (starts, ends, speakers, offsets)):
+            values.frombytes(zlib.decompress(blob))
+        return timings
+
+    def word_at_offset(self, char_offset: int) -> int:
+        """Returns the index of the word containing (or just before) a character offset."""
+        return max(bisect_right(self.offsets, char_offset) - 1, 0)
+
+    def word_at_time(self, seconds: float) -> int:
+        """Returns the index of the word being spoken at (or just before) `seconds`."""
+        return max(bisect_right(self.starts, seconds) - 1, 0)
+
+def build_word_timings(words: list, transcript: str = None):
+    """
+    Converts a Deepgram word list into transcript text and WordTimings.
+
+    Args:
+        words (list): Deepgram word dicts with `start`, `end`, `word` and
+            optionally `punctuated_word` and `speaker`.
+        transcript (str): The transcript the words belong to. If given, each
+            word is located in it in order; otherwise the transcript is built
+            by joining the words with spaces.
+
+    Returns:
+        tuple: (transcript, WordTimings).
+    """
+    timings = WordTimings()
+    parts = []
+    position = 0
+    for word in words:
+        text = word.get('punctuated_word') or word.get('word') or ''
+        if not text:
+            continue
+        if transcript is None:
+            if parts:
+                position += 1
+            offset = position
+            parts.append(text)
+            position += len(text)
+        else:
+            found = transcript.find(text, position)
+            # smart_format can rewrite words (numbers, currency), so fall back to the running position
+            offset = found if found != -1 and found - position < 64 else position
+            position = offset + (len(text) if found == offset else 0)
+        timings.starts.append(float(word.get('start', 0.0)))
+        timings.ends.append(float(word.get('end', 0.0)))
+        timings.speakers.append(int(word.get('speaker', NO_SPEAKER)))
+        timings.offsets.append(offset)
+    if transcript is None:
+        transcript = ' '.join(parts)
+    return transcript, timings
+
+def _word_spans(transcript: str, timings: WordTimings):
+    """Yields (word_index, lowercased word text) using the stored offsets."""
+    offsets = timings.offsets
+    for index, start in enumerate(offsets):
+        end = offsets[index + 1] if index + 1 < len(offsets) else len(transcript)
+        yield index, transcript[start:end].lower()
+
+def find_passage_time(transcript: str, timings: WordTimings, passage: str):
+    """
+    Finds when a passage is spoken in the video.
+
+    A verbatim passage (such as a quoted transcript line) is located directly
+    and mapped to its word with a binary search over the word offsets.
+    Otherwise, as for summary bullets that paraphrase the lecture, the passage
+    is matched to the stretch of MATCH_WINDOW_WORDS transcript words that
+    contains the most of its distinct terms.
+
+    Returns:
+        float: Seconds from the start of the video, or None if nothing matches.
+    """
+    if not len(timings) or not passage:
+        return None
+
+    needle = _SPACE_RE.sub(' ', passage).strip().lower()
+    if len(needle) >= 20:
+        char_offset = transcript.lower().find(needle)
+        if char_offset != -1:
+            return float(timings.starts[timings.word_at_offset(char_offset)])
+
+    terms = {term for term in _TERM_RE.findall(needle) if len(term) >= MATCH_MIN_TERM_LENGTH}
+    if not terms:
+        return None
+    hits = []
+    for index, text in _word_spans(transcript, timings):
+        for term in _TERM_RE.findall(text):
+            if term in terms:
+                hits.append((index, term))
+
+    best_count, best_index = 0, None
+    window_counts = {}
+    left = 0
+    for index, term in hits:
+        window_counts[term] = window_counts.get(term, 0) + 1
+        while index - hits[left][0] >= MATCH_WINDOW_WORDS:
+            left_term = hits[left][1]
+            window_counts[left_term] -= 1
+            if not window_counts[left_term]:
+                del window_counts[left_term]
+            left += 1
+        if len(window_counts) > best_count:
+            best_count, best_index = len(window_counts), hits[left][0]
+
+    # A single shared word is too weak to point at a moment in the video
+    if best_index is None or best_count < min(2, len(terms)):
+        return None
+    return float(timings.starts[best_index])
+
+def format_timestamp(seconds: float) -> str:
+    """Formats seconds as m:ss or h:mm:ss."""
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
@@ -0,0 +1,200 @@
+"""
+Worker processes for the transcribe-and-summarize job queue.
+
+Each worker claims the oldest queued job from jobs.db, runs the pipeline and
+stores the summary on the job for the Streamlit app to pick up. Workers do not
+import Streamlit; API keys come from DEEPGRAM_API_KEY and GEMINI_API_KEY in the
+environment (or .streamlit/secrets.toml when Streamlit is installed).
+
+The parent process restarts any worker that dies. Ctrl+C stops the workers
+once their current job is finished.
+
+Usage:
+    python worker.py --workers 2
+    python worker.py --workers 2 --segmented always
+    python worker.py --workers 2 --stream-audio --stream-chunk-size 131072 --stream-buffer-chunks 8
+"""
+import argparse
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+
+import job_queue
+from metrics import pipeline_run
+
+WORKER_POLL_SECONDS = 1.0
+WORKER_HEARTBEAT_SECONDS = 10.0
+# How often the parent checks for worker processes that died and restarts them
+WORKER_SUPERVISE_SECONDS = 2.0
+# How often streamed summary text is written to the job for the app to render
+PARTIAL_RESULT_FLUSH_SECONDS = 0.5
+
+logger = logging.getLogger("flashlearn.worker")
+
+class _JobHeartbeat:
+    """Keeps a running job's heartbeat fresh while a long pipeline stage blocks."""
+
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+        self.stage = "Starting"
+        self.progress = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(WORKER_HEARTBEAT_SECONDS):
+            job_queue.update_progress(self.job_id, self.stage, self.progress)
+
+    def report(self, stage: str, progress: float):
+        self.stage = stage
+        self.progress = progress
+        job_queue.update_progress(self.job_id, stage, progress)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+def _stream_summary(job_id: int, transcript: str, summary_level: str, summarize_text_stream, on_preprocessed) -> str:
+    """Streams the summary, periodically publishing the text so far, and returns the full text."""
+    parts = []
+    last_flush = 0.0
+    for piece in summarize_text_stream(transcript, summary_level, on_preprocessed=on_preprocessed):
+        parts.append(piece)
+        now = time.monotonic()
+        if now - last_flush >= PARTIAL_RESULT_FLUSH_SECONDS:
+            job_queue.update_partial_result(job_id, ''.join(parts))
+            last_flush = now
+    return ''.join(parts)
+
+def run_job(job: dict, transcribe_options: dict = None):
+    """
+    Runs the pipeline for one claimed job and records the result or error on it.
+
+    `transcribe_options` are passed as keyword arguments to transcribe_youtube_video.
+    """
+    # Imported here so the parent process that only spawns workers stays light
+    from transcriber import transcribe_youtube_video, TranscriptionError
+    from summarizer import summarize_text_stream, SummarizationError
+
+    with _JobHeartbeat(job['id']) as heartbeat, pipeline_run("worker_job", label=job['youtube_url']) as run:
+        try:
+            heartbeat.report("Downloading and transcribing video", 0.1)
+            transcript = transcribe_youtube_video(job['youtube_url'], **(transcribe_options or {}))
+            heartbeat.report("Summarizing notes with Gemini", 0.6)
+
+            def report_tokens(stats):
+                heartbeat.report(
+                    f"Summarizing notes with Gemini ({stats['tokens_before']:,} -> {stats['tokens_after']:,} tokens)",
+                    0.6
+                )
+
+            summary = _stream_summary(
+                job['id'], transcript, job['summary_level'], summarize_text_stream, report_tokens
+            )
+        except (TranscriptionError, SummarizationError) as e:
+            run.ok = False
+            job_queue.fail_job(job['id'], str(e))
+            return
+        except Exception as e:
+            run.ok = False
+            logger.exception("Job %s failed", job['id'])
+            job_queue.fail_job(job['id'], f"Unexpected error: {e}")
+            return
+    job_queue.complete_job(job['id'], summary)
+
+def worker_loop(poll_seconds: float = None, stale_seconds: float = None, max_attempts: int = None,
+                stop_event=None, transcribe_options: dict = None):
+    """Claims and runs jobs until `stop_event` is set, recovering jobs from crashed workers."""
+    poll_seconds = poll_seconds or WORKER_POLL_SECONDS
+    worker_id = job_queue.make_worker_id()
+    last_heartbeat = 0.0
+    logger.info("Worker %s started", worker_id)
+
+    while stop_event is None or not stop_event.is_set():
+        now = time.time()
+        if now - last_heartbeat >= WORKER_HEARTBEAT_SECONDS:
+            job_queue.heartbeat_worker(worker_id)
+            job_queue.recover_stale_jobs(stale_seconds, max_attempts)
+            last_heartbeat = now
+
+        job = job_queue.claim_next_job(worker_id)
+        if job is None:
+            time.sleep(poll_seconds)
+            continue
+
+        logger.info("Worker %s running job %s (attempt %s)", worker_id, job['id'], job['attempts'])
+        run_job(job, transcribe_options)
+        job_queue.heartbeat_worker(worker_id)
+
+def _worker_main(poll_seconds, stale_seconds, max_attempts, stop_event, transcribe_options):
+    # Ctrl+C reaches the whole process group; only the parent reacts, by setting
+    # stop_event, so a job in progress is finished rather than abandoned mid-run
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    from transcriber import SEGMENTED_MODES
+    transcribe_options = dict(transcribe_options, segmented=SEGMENTED_MODES[transcribe_options['segmented']])
+    worker_loop(poll_seconds, stale_seconds, max_attempts, stop_event, transcribe_options)
+
+def _transcribe_options(args) -> dict:
+    """Returns the transcribe_youtube_video options chosen on the command line, with segmented as a mode name."""
+    return {
+        'segmented': args.segmented,
+        'stream_audio': args.stream_audio,
+        'stream_chunk_size': args.stream_chunk_size,
+        'stream_buffer_chunks': args.stream_buffer_chunks
+    }
+
+def _start_worker(index: int, args, stop_event) -> multiprocessing.Process:
+    process = multiprocessing.Process(
+        target=_worker_main,
+        args=(args.poll_seconds, args.stale_seconds, args.max_attempts, stop_event, _transcribe_options(args)),
+        name=f"flashlearn-worker-{index}"
+    )
+    process.start()
+    return process
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=2, help="Number of worker processes")
+    parser.add_argument('--poll-seconds', type=float, default=WORKER_POLL_SECONDS, help="Idle queue polling interval")
+    parser.add_argument('--stale-seconds', type=float, default=job_queue.JOB_STALE_SECONDS,
+                        help="Re-queue running jobs with no heartbeat for this long")
+    parser.add_argument('--max-attempts', type=int, default=job_queue.JOB_MAX_ATTEMPTS,
+                        help="Fail a job after this many crashed attempts")
+    parser.add_argument('--segmented', choices=['auto', 'always', 'never'], default='auto',
+                        help="Transcribe videos as parallel segments: always, never, or (auto) only long ones")
+    parser.add_argument('--stream-audio', action='store_true',
+                        help="Pipe downloads straight into the Deepgram upload instead of staging them on disk")
+    parser.add_argument('--stream-chunk-size', type=int, default=None,
+                        help="Bytes per streamed audio chunk (default: transcriber.STREAM_CHUNK_SIZE)")
+    parser.add_argument('--stream-buffer-chunks', type=int, default=None,
+                        help="Chunks buffered ahead of the upload (default: transcriber.STREAM_BUFFER_CHUNKS)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    stop_event = multiprocessing.Event()
+    processes = [_start_worker(index, args, stop_event) for index in range(args.workers)]
+    logger.info("Started %d worker process(es)", len(processes))
+
+    try:
+        while True:
+            time.sleep(WORKER_SUPERVISE_SECONDS)
+            for index, process in enumerate(processes):
+                if not process.is_alive():
+                    # Its job, if any, is re-queued by recover_stale_jobs once the heartbeat goes stale
+                    logger.warning("Worker %s exited with code %s; restarting it", process.name, process.exitcode)
+                    processes[index] = _start_worker(index, args, stop_event)
+    except KeyboardInterrupt:
+        logger.info("Stopping workers after their current job...")
+        stop_event.set()
+        for process in processes:
+            process.join()
+
+if __name__ == '__main__':
+    main()
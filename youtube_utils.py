@@ -0,0 +1,53 @@
+import re
+from urllib.parse import urlparse, parse_qs
+
+_VIDEO_ID_RE = re.compile(r'^[A-Za-z0-9_-]{11}$')
+_PATH_PREFIXES = ('embed', 'shorts', 'live', 'v', 'e')
+
+def extract_video_id(youtube_url: str):
+    """
+    Extracts the canonical 11-character video ID from a YouTube URL.
+
+    Handles watch URLs (with extra query parameters such as `t` or `list`),
+    youtu.be short links, embed/shorts/live paths and bare video IDs.
+
+    Args:
+        youtube_url (str): The URL (or bare ID) of the YouTube video.
+
+    Returns:
+        str: The video ID, or None if it cannot be determined.
+    """
+    if not youtube_url:
+        return None
+
+    candidate = youtube_url.strip()
+    if _VIDEO_ID_RE.match(candidate):
+        return candidate
+
+    if '://' not in candidate:
+        candidate = f"https://{candidate}"
+    parsed = urlparse(candidate)
+    host = (parsed.hostname or '').lower()
+    path_parts = [part for part in parsed.path.split('/') if part]
+
+    video_id = None
+    if host.endswith('youtu.be'):
+        video_id = path_parts[0] if path_parts else None
+    elif host.endswith('youtube.com') or host.endswith('youtube-nocookie.com'):
+        query = parse_qs(parsed.query)
+        if 'v' in query:
+            video_id = query['v'][0]
+        elif len(path_parts) >= 2 and path_parts[0] in _PATH_PREFIXES:
+            video_id = path_parts[1]
+
+    if video_id and _VIDEO_ID_RE.match(video_id):
+        return video_id
+    return None
+
+def canonical_video_url(video_id: str) -> str:
+    """Returns the canonical watch URL for a YouTube video ID."""
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+def timestamp_url(video_id: str, seconds: float) -> str:
+    """Returns a watch URL that starts playback `seconds` into the video."""
+    return f"{canonical_video_url(video_id)}&t={int(seconds)}s"